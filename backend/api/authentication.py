@@ -0,0 +1,58 @@
+import copy
+import time
+
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from foodgram.metrics import record_cache
+from .short_links import LRUCache
+
+LOCAL_CACHE_SIZE = 1024
+# Токен, удалённый в другом процессе, может действовать здесь ещё
+# LOCAL_CACHE_TIMEOUT секунд.
+LOCAL_CACHE_TIMEOUT = 5
+SHARED_CACHE_TIMEOUT = 5 * 60
+
+local_tokens = LRUCache(LOCAL_CACHE_SIZE)
+
+
+def token_key(key):
+    return f'auth-token:{key}'
+
+
+def forget_tokens(keys):
+    """Сброс закешированных токенов после выхода или смены данных."""
+
+    for key in keys:
+        local_tokens.delete(key)
+    cache.delete_many([token_key(key) for key in keys])
+
+
+def forget_user_tokens(user_id):
+    forget_tokens(list(
+        Token.objects.filter(user_id=user_id).values_list('key', flat=True)))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену без запроса к базе на каждый вызов.
+
+    Пара (пользователь, токен) хранится в памяти процесса с коротким
+    сроком жизни и в общем кеше; сбрасывается сигналами при выходе,
+    смене пароля и деактивации пользователя.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = local_tokens.get(key)
+        if cached is None or cached[0] < time.monotonic():
+            credentials = cache.get(token_key(key))
+            record_cache('auth_tokens', hits=credentials is not None,
+                         misses=credentials is None)
+            if credentials is None:
+                credentials = super().authenticate_credentials(key)
+                cache.set(token_key(key), credentials, SHARED_CACHE_TIMEOUT)
+            cached = (time.monotonic() + LOCAL_CACHE_TIMEOUT, credentials)
+            local_tokens.set(key, cached)
+        user, token = cached[1]
+        # Копия, чтобы изменения в запросе не попадали в кеш процесса.
+        return copy.copy(user), token
@@ -0,0 +1,125 @@
+import time
+
+from django.core.cache import cache
+
+from foodgram.metrics import record_cache
+from recipes.models import Ingredient, Tag
+
+VERSION_CHECK_INTERVAL = 1
+
+
+def version_key(name):
+    return f'version:{name}'
+
+
+def get_version(name):
+    """Текущая версия набора данных из общего кеша.
+
+    Версия хранится без срока жизни; если ключ вытеснен, выставляется
+    новая, что заставит все процессы перечитать данные.
+    """
+
+    version = cache.get(version_key(name))
+    if version is None:
+        version = bump_version(name)
+    return version
+
+
+def get_versions(names):
+    """Версии нескольких наборов данных одним запросом к кешу."""
+
+    stored = cache.get_many([version_key(name) for name in names])
+    return {
+        name: stored.get(version_key(name)) or bump_version(name)
+        for name in names
+    }
+
+
+def author_version_name(user_id):
+    """Версия данных автора, входящих в представление его рецептов."""
+
+    return f'author:{user_id}'
+
+
+def user_version_name(user_id):
+    """Версия данных, зависящих от пользователя: избранное, корзина,
+    подписки."""
+
+    return f'user:{user_id}'
+
+
+def bump_version(name):
+    version = time.time()
+    cache.set(version_key(name), version, None)
+    return version
+
+
+def reference_row(instance, fields):
+    """Запись справочника в том же виде, что и в ReferenceCache."""
+
+    return {field: getattr(instance, field) for field in fields}
+
+
+class ReferenceCache:
+    """Справочник в памяти процесса, согласованный через версию в кеше."""
+
+    def __init__(self, name, model, fields):
+        self.name = name
+        self.model = model
+        self.fields = fields
+        self._version = None
+        self._checked_at = 0
+        self._items = None
+        self._list = None
+
+    def invalidate(self):
+        bump_version(self.name)
+        self._items = None
+        self._checked_at = 0
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now - self._checked_at < VERSION_CHECK_INTERVAL:
+            return
+        version = get_version(self.name)
+        if version != self._version:
+            self._version = version
+            self._items = None
+        self._checked_at = now
+
+    def _load(self):
+        items = list(self.model.objects.values(*self.fields))
+        # Прежний список сохраняется, если данные не изменились:
+        # зависящие от него индексы не перестраиваются.
+        if items != self._list:
+            self._list = items
+        self._items = {item['id']: item for item in self._list}
+
+    def list(self):
+        """Все записи справочника в порядке сортировки модели."""
+
+        self._check_version()
+        record_cache(self.name, hits=self._items is not None,
+                     misses=self._items is None)
+        if self._items is None:
+            self._load()
+        return self._list
+
+    def get(self, pk):
+        """Запись по id; None, только если её нет и в базе."""
+
+        self.list()
+        item = self._items.get(pk)
+        if item is None:
+            # Запись могла появиться в другом процессе до смены версии:
+            # она читается из базы одна, без перечитывания справочника.
+            item = self.model.objects.filter(pk=pk).values(
+                *self.fields).first()
+            if item is not None:
+                self._items[pk] = item
+        return item
+
+
+tag_cache = ReferenceCache('tags', Tag, ('id', 'name', 'slug'))
+ingredient_cache = ReferenceCache(
+    'ingredients', Ingredient, ('id', 'name', 'measurement_unit'))
@@ -0,0 +1,48 @@
+import hashlib
+
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+
+from .caches import get_version
+
+
+class ConditionalGetMixin:
+    """Ответ 304 по ETag и Last-Modified до сериализации данных.
+
+    Валидаторы строятся из меток версий (время последнего изменения)
+    наборов данных, которые перечисляет get_version_names.
+    """
+
+    version_names = ()
+    cache_control = {'private': True, 'no_cache': True}
+
+    def get_version_names(self, request):
+        return list(self.version_names)
+
+    def get_version_stamps(self, request):
+        return [get_version(name)
+                for name in self.get_version_names(request)]
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(request, super().retrieve, *args, **kwargs)
+
+    def conditional(self, request, handler, *args, **kwargs):
+        stamps = self.get_version_stamps(request)
+        if not stamps:
+            return handler(request, *args, **kwargs)
+        etag = quote_etag(hashlib.md5(
+            f'{request.get_full_path()}:{stamps}'.encode()).hexdigest())
+        last_modified = int(max(stamps))
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, **self.cache_control)
+        patch_vary_headers(response, ['Authorization'])
+        return response
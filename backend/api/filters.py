@@ -1,44 +1,68 @@
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
+from rest_framework.filters import BaseFilterBackend
 
-from recipes.models import Recipe, Tag
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart, Tag
+from .search import search_recipes
 
+POPULAR_ORDERING = ('-favorites_count', '-id')
 
-def base_filter(self, queryset, name, value):
-    user = self.request.user
-    if user.is_authenticated:
-        if value == 1:
-            return queryset.filter(favorites__user=user)
-        elif value == 0:
-            return queryset.exclude(favorites__user=user)
-    return queryset
 
+class RecipeFilter(filters.FilterSet):
+    """Фильтрация рецептов подзапросами EXISTS, без JOIN и DISTINCT."""
 
-class IsFavoritedFilter(filters.FilterSet):
     is_favorited = filters.NumberFilter(method='filter_is_favorited')
+    is_in_shopping_cart = filters.NumberFilter(
+        method='filter_is_in_shopping_cart')
+    tags = filters.ModelMultipleChoiceFilter(
+        queryset=Tag.objects.all(),
+        to_field_name='slug',
+        method='filter_tags',
+    )
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'По числу добавлений в избранное'),),
+        method='filter_ordering',
+    )
 
     class Meta:
         model = Recipe
-        fields = ['author', 'tags', 'is_favorited']
+        fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+                  'ordering']
+
+    def filter_user_relation(self, queryset, model, value):
+        user = self.request.user
+        if not user.is_authenticated or value not in (0, 1):
+            return queryset
+        related = Exists(model.objects.filter(
+            user=user, recipe=OuterRef('pk')))
+        return queryset.filter(related if value == 1 else ~related)
 
     def filter_is_favorited(self, queryset, name, value):
-        return base_filter(self, queryset, name, value)
+        return self.filter_user_relation(queryset, FavoriteRecipe, value)
 
+    def filter_is_in_shopping_cart(self, queryset, name, value):
+        return self.filter_user_relation(queryset, ShoppingCart, value)
 
-class IsInShoppingCart(filters.FilterSet):
-    is_in_shopping_cart = filters.NumberFilter(
-        method='filter_is_in_shopping_cart')
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'), tag__in=value)))
 
-    class Meta:
-        model = Recipe
-        fields = ['author', 'tags', 'is_in_shopping_cart']
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*POPULAR_ORDERING)
 
-    def filter_is_in_shopping_cart(self, queryset, name, value):
-        return base_filter(self, queryset, name, value)
 
+class RecipeSearchFilter(BaseFilterBackend):
+    """Полнотекстовый поиск по названию и описанию рецепта.
 
-class RecipeFilter(IsFavoritedFilter, IsInShoppingCart):
-    tags = filters.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug',
-    )
+    Результаты упорядочены по релевантности.
+    """
+
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        return search_recipes(queryset, query)
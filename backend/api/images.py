@@ -0,0 +1,68 @@
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_FORMAT = 'WEBP'
+DERIVATIVE_EXTENSION = 'webp'
+DERIVATIVE_QUALITY = 80
+
+# Вариант: (размер, обрезать ли до точного размера).
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': ((480, 320), True),
+    'webp': ((1280, 1280), False),
+}
+AVATAR_VARIANTS = {
+    'thumbnail': ((96, 96), True),
+}
+
+
+def derivative_name(name, variant):
+    """Имя производного файла рядом с оригиналом."""
+
+    stem, _ = os.path.splitext(name)
+    return f'{stem}_{variant}.{DERIVATIVE_EXTENSION}'
+
+
+def render_variant(image, size, crop):
+    if crop:
+        return ImageOps.fit(image, size, Image.LANCZOS)
+    image = image.copy()
+    image.thumbnail(size, Image.LANCZOS)
+    return image
+
+
+def generate_derivatives(field_file, variants):
+    """Создание уменьшенных копий изображения в формате WebP.
+
+    Уже существующие копии не пересоздаются. Возвращает число созданных.
+    """
+
+    if not field_file:
+        return 0
+    storage = field_file.storage
+    missing = {
+        variant: options for variant, options in variants.items()
+        if not storage.exists(derivative_name(field_file.name, variant))
+    }
+    if not missing:
+        return 0
+    try:
+        with field_file.open('rb') as file:
+            image = ImageOps.exif_transpose(Image.open(file))
+            image = image.convert('RGBA' if 'A' in image.getbands()
+                                  else 'RGB')
+    except (OSError, ValueError):
+        logger.warning('Не удалось открыть изображение %s', field_file.name)
+        return 0
+    for variant, (size, crop) in missing.items():
+        buffer = io.BytesIO()
+        render_variant(image, size, crop).save(
+            buffer, DERIVATIVE_FORMAT, quality=DERIVATIVE_QUALITY)
+        storage.save_derivative(derivative_name(field_file.name, variant),
+                                ContentFile(buffer.getvalue()))
+    return len(missing)
@@ -0,0 +1,200 @@
+import csv
+import json
+import random
+import statistics
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (FavoriteRecipe, Follow, Ingredient, Recipe,
+                            RecipeIngredients, ShoppingCart, Tag)
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+TAGS_COUNT = 3
+IMAGE_NAME = 'recipes/images/benchmark.png'
+
+
+def endpoint_urls(dataset):
+    """Замеряемые эндпоинты для сгенерированного набора данных."""
+
+    return {
+        'recipes-list': '/api/recipes/',
+        'recipes-detail': f'/api/recipes/{dataset["recipe_id"]}/',
+        'subscriptions': '/api/users/subscriptions/',
+        'ingredients-search': (
+            f'/api/ingredients/?name={dataset["ingredient_prefix"]}'),
+        'download-shopping-cart': '/api/recipes/download_shopping_cart/',
+    }
+
+
+def authenticated_client(user):
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+class Command(BaseCommand):
+    help = ('Наполняет базу синтетическими данными и замеряет задержку '
+            'и число SQL-запросов основных эндпоинтов API.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=500)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=10)
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Избранных рецептов на пользователя.')
+        parser.add_argument('--carts', type=int, default=10,
+                            help='Рецептов в корзине на пользователя.')
+        parser.add_argument('--follows', type=int, default=10,
+                            help='Подписок на пользователя.')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument(
+            '--ingredients-csv',
+            default=settings.BASE_DIR.parent / 'data' / 'ingredients.csv')
+        parser.add_argument('--output', help='Файл для JSON с результатами.')
+        parser.add_argument('--keep', action='store_true',
+                            help='Не откатывать сгенерированные данные.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        with transaction.atomic():
+            dataset = self.seed(options)
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                results = self.measure(dataset, options['iterations'])
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        report = json.dumps({
+            'database': connection.vendor,
+            'dataset': {key: options[key] for key in (
+                'users', 'recipes', 'ingredients_per_recipe', 'favorites',
+                'carts', 'follows')},
+            'iterations': options['iterations'],
+            'endpoints': results,
+        }, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(report)
+        else:
+            self.stdout.write(report)
+
+    def load_ingredients(self, path):
+        """Загрузка ингредиентов из CSV одним bulk_create."""
+
+        with open(path, encoding='utf-8') as file:
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=name, measurement_unit=unit)
+                 for name, unit in csv.reader(file)),
+                batch_size=BATCH_SIZE, ignore_conflicts=True)
+        return list(Ingredient.objects.values_list('id', flat=True))
+
+    def seed(self, options):
+        """Генерация пользователей, рецептов и связей между ними."""
+
+        run = uuid.uuid4().hex[:8]
+        ingredient_ids = self.load_ingredients(options['ingredients_csv'])
+        Tag.objects.bulk_create(
+            Tag(name=f'bench-{run}-{i}', slug=f'bench-{run}-{i}')
+            for i in range(TAGS_COUNT))
+        # SQLite не возвращает id из bulk_create, поэтому перечитываем.
+        tag_ids = list(Tag.objects.filter(
+            slug__startswith=f'bench-{run}-').values_list('id', flat=True))
+
+        password = make_password(None)
+        User.objects.bulk_create(
+            (User(email=f'bench-{run}-{i}@example.com',
+                  username=f'bench-{run}-{i}', password=password,
+                  first_name='Bench', last_name=str(i))
+             for i in range(options['users'])),
+            batch_size=BATCH_SIZE)
+        users = list(User.objects.filter(
+            username__startswith=f'bench-{run}-').order_by('id'))
+
+        Recipe.objects.bulk_create(
+            (Recipe(author=random.choice(users),
+                    name=f'bench-{run}-{i}', text='Описание',
+                    cooking_time=random.randint(1, 120), image=IMAGE_NAME)
+             for i in range(options['recipes'])),
+            batch_size=BATCH_SIZE)
+        recipe_ids = list(Recipe.objects.filter(
+            name__startswith=f'bench-{run}-').values_list('id', flat=True))
+
+        per_recipe = min(options['ingredients_per_recipe'],
+                         len(ingredient_ids))
+        RecipeIngredients.objects.bulk_create(
+            (RecipeIngredients(recipe_id=recipe_id, ingredient_id=ingredient,
+                               amount=random.randint(1, 500))
+             for recipe_id in recipe_ids
+             for ingredient in random.sample(ingredient_ids, per_recipe)),
+            batch_size=BATCH_SIZE)
+        Recipe.tags.through.objects.bulk_create(
+            (Recipe.tags.through(recipe_id=recipe_id,
+                                 tag_id=random.choice(tag_ids))
+             for recipe_id in recipe_ids),
+            batch_size=BATCH_SIZE)
+
+        for model, key in ((FavoriteRecipe, 'favorites'),
+                           (ShoppingCart, 'carts')):
+            count = min(options[key], len(recipe_ids))
+            model.objects.bulk_create(
+                (model(user=user, recipe_id=recipe_id)
+                 for user in users
+                 for recipe_id in random.sample(recipe_ids, count)),
+                batch_size=BATCH_SIZE)
+        Follow.objects.bulk_create(
+            (Follow(subscriber=user, author=author)
+             for user in users
+             for author in random.sample(
+                 users, min(options['follows'], len(users)))
+             if author != user),
+            batch_size=BATCH_SIZE)
+
+        return {
+            'user': users[0],
+            'recipe_id': random.choice(recipe_ids),
+            'ingredient_prefix': Ingredient.objects.values_list(
+                'name', flat=True).first()[:3],
+        }
+
+    def measure(self, dataset, iterations):
+        """Замер p50/p95 задержки и числа запросов для каждого эндпоинта."""
+
+        client = authenticated_client(dataset['user'])
+        return {
+            name: self.measure_endpoint(client, url, iterations)
+            for name, url in endpoint_urls(dataset).items()
+        }
+
+    def measure_endpoint(self, client, url, iterations):
+        timings = []
+        queries = []
+        for _ in range(iterations + 1):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(len(context))
+        # Первый запрос прогревочный и в статистику не входит.
+        timings, queries = sorted(timings[1:]), queries[1:]
+        return {
+            'url': url,
+            'status': response.status_code,
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(
+                timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+            'queries': max(queries),
+        }
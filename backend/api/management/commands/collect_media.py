@@ -0,0 +1,60 @@
+import os
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from api.images import (AVATAR_VARIANTS, RECIPE_IMAGE_VARIANTS,
+                        derivative_name)
+from foodgram.storage import (is_referenced, media_directories,
+                              referenced_names)
+
+
+def source_stem(name):
+    """Имя оригинала без расширения для файла или его производной копии."""
+    directory, filename = os.path.split(name)
+    return os.path.join(directory, filename.split('.')[0].split('_')[0])
+
+
+class Command(BaseCommand):
+    help = ('Удаляет из media файлы, на которые не ссылается ни одна '
+            'запись, вместе с их уменьшенными копиями.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help='Не трогать файлы моложе указанного числа секунд.')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        variants = {*RECIPE_IMAGE_VARIANTS, *AVATAR_VARIANTS}
+        keep = set()
+        for name in referenced_names():
+            keep.add(name)
+            keep.update(derivative_name(name, variant)
+                        for variant in variants)
+
+        threshold = time.time() - options['min_age']
+        removed = freed = 0
+        for directory in media_directories():
+            if not default_storage.exists(directory):
+                continue
+            for filename in default_storage.listdir(directory)[1]:
+                name = os.path.join(directory, filename)
+                if name in keep:
+                    continue
+                path = default_storage.path(name)
+                stat = os.stat(path)
+                if stat.st_mtime > threshold:
+                    continue
+                # Пока шёл обход, на файл могла сослаться новая запись.
+                if is_referenced(source_stem(name)):
+                    continue
+                removed += 1
+                freed += stat.st_size
+                if not options['dry_run']:
+                    os.remove(path)
+
+        self.stdout.write(
+            f'{"Будет удалено" if options["dry_run"] else "Удалено"} '
+            f'файлов: {removed}, {freed / 1024 / 1024:.1f} МБ')
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from api.caches import author_version_name, bump_version
+from api.images import (AVATAR_VARIANTS, RECIPE_IMAGE_VARIANTS,
+                        generate_derivatives)
+from recipes.models import Recipe
+from users.models import User
+
+CHUNK_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = ('Создаёт недостающие уменьшенные копии изображений рецептов '
+            'и аватаров, например для файлов, загруженных до их появления.')
+
+    def handle(self, *args, **options):
+        created = 0
+        authors = set()
+        for recipe in Recipe.objects.only('id', 'author_id', 'image').iterator(
+                chunk_size=CHUNK_SIZE):
+            if generate_derivatives(recipe.image, RECIPE_IMAGE_VARIANTS):
+                created += 1
+                authors.add(recipe.author_id)
+        for user in User.objects.only('id', 'avatar').iterator(
+                chunk_size=CHUNK_SIZE):
+            if generate_derivatives(user.avatar, AVATAR_VARIANTS):
+                created += 1
+                authors.add(user.id)
+
+        # Закешированные представления рецептов ссылаются на оригиналы.
+        for author_id in authors:
+            bump_version(author_version_name(author_id))
+        if authors:
+            bump_version('recipes')
+        self.stdout.write(f'Изображений с новыми копиями: {created}')
@@ -0,0 +1,149 @@
+import base64
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from foodgram.metrics import record_cache
+from .filters import POPULAR_ORDERING, RecipeSearchFilter
+from .search import SEARCH_ORDERING
+
+
+class FeedPagination(LimitOffsetPagination):
+    """Limit/offset с необязательным режимом keyset-пагинации.
+
+    Режим keyset включается параметром cursor (пустым для первой
+    страницы): строки выбираются по условию на ключ сортировки
+    keyset_ordering, поэтому глубина прокрутки не влияет на стоимость
+    запроса, а COUNT(*) не выполняется.
+    """
+
+    cursor_query_param = 'cursor'
+    keyset_ordering = ('-id',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.keyset_ordering = self.get_keyset_ordering(request)
+        position = self.decode_cursor(
+            request.query_params[self.cursor_query_param], queryset)
+        queryset = queryset.order_by(*self.keyset_ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+        rows = list(queryset[:self.limit + 1])
+        self.next_position = None
+        if len(rows) > self.limit:
+            rows = rows[:self.limit]
+            self.next_position = [
+                getattr(rows[-1], field.lstrip('-'))
+                for field in self.keyset_ordering
+            ]
+        return rows
+
+    def get_keyset_ordering(self, request):
+        return self.keyset_ordering
+
+    def after(self, position):
+        """Условие «строго после позиции» для составного ключа."""
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.keyset_ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def decode_cursor(self, cursor, queryset):
+        """Позиция из курсора со значениями, приведёнными к типам полей."""
+        if not cursor:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except ValueError:
+            raise NotFound('Некорректный курсор.')
+        if (not isinstance(position, list)
+                or len(position) != len(self.keyset_ordering)):
+            raise NotFound('Некорректный курсор.')
+        values = []
+        for field, value in zip(self.keyset_ordering, position):
+            try:
+                value = self.keyset_field(
+                    queryset, field.lstrip('-')).to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                value = None
+            if value is None:
+                raise NotFound('Некорректный курсор.')
+            values.append(value)
+        return values
+
+    def keyset_field(self, queryset, name):
+        try:
+            return queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return queryset.query.annotations[name].output_field
+
+    def encode_cursor(self, position):
+        return base64.urlsafe_b64encode(
+            json.dumps(position, ensure_ascii=False).encode()).decode()
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param,
+            self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', None),
+            ('results', data),
+        ]))
+
+    def get_count(self, queryset):
+        """Число строк, при PAGINATION_COUNT_CACHE_TIMEOUT — из кеша."""
+        timeout = getattr(settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', 0)
+        if not timeout:
+            return super().get_count(queryset)
+        key = 'pagination-count:' + hashlib.md5(
+            str(queryset.query).encode()).hexdigest()
+        count = cache.get(key)
+        record_cache('pagination_count', hits=count is not None,
+                     misses=count is None)
+        if count is None:
+            count = super().get_count(queryset)
+            cache.set(key, count, timeout)
+        return count
+
+
+class RecipePagination(FeedPagination):
+    keyset_ordering = ('name', 'id')
+
+    def get_keyset_ordering(self, request):
+        if request.query_params.get(
+                RecipeSearchFilter.search_param, '').strip():
+            return SEARCH_ORDERING
+        if request.query_params.get('ordering') == 'popular':
+            return POPULAR_ORDERING
+        return self.keyset_ordering
+
+
+class SubscriptionPagination(FeedPagination):
+    keyset_ordering = ('-id',)
@@ -0,0 +1,160 @@
+import datetime
+import threading
+import time
+
+import numpy as np
+from django.db.models import Count, Sum
+
+from recipes.models import Recipe, RecipeIngredients
+from .caches import VERSION_CHECK_INTERVAL, get_versions
+
+ID_DTYPE = np.int64
+EMPTY = np.empty(0, dtype=ID_DTYPE)
+# Рецепт, сохранённый в транзакции, закоммиченной позже более нового,
+# всё равно попадёт в выборку по updated_at с этим запасом.
+WATERMARK_OVERLAP = datetime.timedelta(minutes=1)
+
+
+class PantryIndex:
+    """Инвертированный индекс «ингредиент → рецепты» в памяти процесса.
+
+    Для каждого ингредиента хранится отсортированный массив id рецептов,
+    ингредиенты рецептов — в виде CSR: _indices[_indptr[i]:_indptr[i + 1]]
+    относятся к рецепту _recipe_ids[i]. После смены версии рецептов
+    перечитываются только рецепты с updated_at не старше отметки
+    последнего обновления; если после этого число или сумма id рецептов
+    не совпадает с базой (рецепт удалён), индекс строится заново. Смена
+    версии pantry (удалён ингредиент) всегда ведёт к полной перестройке.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = None
+        self._checked_at = 0
+        self._watermark = None
+        self._recipe_ids = EMPTY
+        self._indptr = np.zeros(1, dtype=ID_DTYPE)
+        self._indices = EMPTY
+        self._postings = {}
+
+    def refresh(self):
+        now = time.monotonic()
+        if now - self._checked_at < VERSION_CHECK_INTERVAL:
+            return
+        versions = get_versions(['recipes', 'pantry'])
+        with self._lock:
+            if versions != self._versions:
+                if (self._watermark is None or self._versions is None
+                        or versions['pantry'] != self._versions['pantry']):
+                    self._build()
+                else:
+                    self._update()
+                if not self._matches_database():
+                    self._build()
+                self._versions = versions
+            self._checked_at = now
+
+    def _matches_database(self):
+        totals = Recipe.objects.aggregate(count=Count('id'), sum=Sum('id'))
+        return (totals['count'] == len(self._recipe_ids)
+                and (totals['sum'] or 0) == int(self._recipe_ids.sum()))
+
+    def _build(self):
+        recipes = list(Recipe.objects.order_by('id').values_list(
+            'id', 'updated_at'))
+        rows = np.array(
+            RecipeIngredients.objects.order_by('recipe_id', 'ingredient_id')
+            .values_list('recipe_id', 'ingredient_id'),
+            dtype=ID_DTYPE,
+        ).reshape(-1, 2)
+        self._recipe_ids = np.array([pk for pk, _ in recipes],
+                                    dtype=ID_DTYPE)
+        sizes = np.bincount(
+            np.searchsorted(self._recipe_ids, rows[:, 0]),
+            minlength=len(self._recipe_ids))
+        self._indptr = np.concatenate(([0], np.cumsum(sizes))).astype(
+            ID_DTYPE)
+        self._indices = rows[:, 1].copy()
+        by_ingredient = rows[np.lexsort((rows[:, 0], rows[:, 1]))]
+        ingredient_ids, starts = np.unique(by_ingredient[:, 1],
+                                           return_index=True)
+        self._postings = dict(zip(
+            ingredient_ids.tolist(),
+            np.split(by_ingredient[:, 0], starts[1:])))
+        self._watermark = max(
+            (updated_at for _, updated_at in recipes), default=None)
+
+    def _update(self):
+        changed = list(Recipe.objects.filter(
+            updated_at__gte=self._watermark - WATERMARK_OVERLAP,
+        ).values_list('id', 'updated_at'))
+        if not changed:
+            return
+        ingredients = {pk: [] for pk, _ in changed}
+        for recipe_id, ingredient_id in RecipeIngredients.objects.filter(
+                recipe_id__in=ingredients).values_list(
+                    'recipe_id', 'ingredient_id'):
+            ingredients[recipe_id].append(ingredient_id)
+        for recipe_id, ingredient_ids in ingredients.items():
+            self._replace(recipe_id, ingredient_ids)
+        self._watermark = max(
+            self._watermark, *(updated_at for _, updated_at in changed))
+
+    def _replace(self, recipe_id, ingredient_ids):
+        new = np.unique(np.array(ingredient_ids, dtype=ID_DTYPE))
+        position = np.searchsorted(self._recipe_ids, recipe_id)
+        if (position == len(self._recipe_ids)
+                or self._recipe_ids[position] != recipe_id):
+            self._recipe_ids = np.insert(
+                self._recipe_ids, position, recipe_id)
+            self._indptr = np.insert(
+                self._indptr, position, self._indptr[position])
+        start, end = self._indptr[position], self._indptr[position + 1]
+        old = self._indices[start:end]
+
+        for ingredient_id in np.setdiff1d(old, new).tolist():
+            posting = self._postings[ingredient_id]
+            self._postings[ingredient_id] = np.delete(
+                posting, np.searchsorted(posting, recipe_id))
+        for ingredient_id in np.setdiff1d(new, old).tolist():
+            posting = self._postings.get(ingredient_id, EMPTY)
+            self._postings[ingredient_id] = np.insert(
+                posting, np.searchsorted(posting, recipe_id), recipe_id)
+
+        # Массивы заменяются целиком: search работает с ними после
+        # снятия блокировки.
+        self._indices = np.concatenate(
+            (self._indices[:start], new, self._indices[end:]))
+        indptr = self._indptr.copy()
+        indptr[position + 1:] += len(new) - len(old)
+        self._indptr = indptr
+
+    def search(self, ingredient_ids, max_missing=None):
+        """Рецепты из имеющихся ингредиентов по убыванию покрытия.
+
+        Возвращает массивы id рецептов, доли покрытия и числа
+        недостающих ингредиентов.
+        """
+
+        self.refresh()
+        with self._lock:
+            postings = [self._postings[pk] for pk in set(ingredient_ids)
+                        if pk in self._postings]
+            all_recipe_ids, indptr = self._recipe_ids, self._indptr
+        if not postings:
+            return EMPTY, np.empty(0), EMPTY
+        recipe_ids, have = np.unique(
+            np.concatenate(postings), return_counts=True)
+        positions = np.searchsorted(all_recipe_ids, recipe_ids)
+        sizes = indptr[positions + 1] - indptr[positions]
+        missing = sizes - have
+        if max_missing is not None:
+            keep = missing <= max_missing
+            recipe_ids, have, sizes, missing = (
+                recipe_ids[keep], have[keep], sizes[keep], missing[keep])
+        coverage = have / sizes
+        order = np.lexsort((recipe_ids, missing, -coverage))
+        return recipe_ids[order], coverage[order], missing[order]
+
+
+pantry_index = PantryIndex()
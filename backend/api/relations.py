@@ -0,0 +1,79 @@
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
+from django.db.models.signals import post_delete, post_save
+from django.http import Http404
+
+
+def quote_table(model, connection):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def quote_columns(model, connection, names):
+    return [connection.ops.quote_name(model._meta.get_field(name).column)
+            for name in names]
+
+
+def url_pk(model, value):
+    """id объекта из URL; некорректное значение — 404, как у get_object()."""
+
+    try:
+        return model._meta.pk.to_python(value)
+    except ValidationError:
+        raise Http404
+
+
+def add_relation(model, **values):
+    """Добавление связи одним INSERT ... ON CONFLICT DO NOTHING.
+
+    Возвращает созданный объект или None, если связь уже есть.
+    Сигналы post_save отправляются вручную, как при create(), в той же
+    транзакции, что и вставка.
+    """
+
+    using = router.db_for_write(model)
+    connection = connections[using]
+    sql = 'INSERT INTO {} ({}) VALUES ({}) ON CONFLICT DO NOTHING RETURNING {}'
+    sql = sql.format(
+        quote_table(model, connection),
+        ', '.join(quote_columns(model, connection, values)),
+        ', '.join(['%s'] * len(values)),
+        connection.ops.quote_name(model._meta.pk.column),
+    )
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, list(values.values()))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        instance = model(pk=row[0], **values)
+        instance._state.adding = False
+        instance._state.db = using
+        post_save.send(sender=model, instance=instance, created=True,
+                       update_fields=None, raw=False, using=using)
+    return instance
+
+
+def remove_relation(model, **values):
+    """Удаление связи одним DELETE ... RETURNING.
+
+    Возвращает число удалённых строк; post_delete отправляется
+    для каждой из них.
+    """
+
+    using = router.db_for_write(model)
+    connection = connections[using]
+    conditions = ' AND '.join(
+        f'{column} = %s'
+        for column in quote_columns(model, connection, values))
+    sql = 'DELETE FROM {} WHERE {} RETURNING {}'.format(
+        quote_table(model, connection), conditions,
+        connection.ops.quote_name(model._meta.pk.column))
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, list(values.values()))
+            rows = cursor.fetchall()
+        for (pk,) in rows:
+            instance = model(pk=pk, **values)
+            instance._state.db = using
+            post_delete.send(sender=model, instance=instance, using=using)
+    return len(rows)
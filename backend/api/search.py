@@ -0,0 +1,123 @@
+import re
+from bisect import bisect_left
+
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+
+from recipes.models import Ingredient
+from .caches import ingredient_cache
+
+INGREDIENT_SEARCH_LIMIT = 50
+RECIPE_SEARCH_CONFIG = 'russian'
+SEARCH_ORDERING = ('-search_rank', 'id')
+SEARCH_WORD = re.compile(r'\w+')
+
+# Полнотекстовый поиск по рецептам, см. миграцию recipes.0012:
+# в PostgreSQL — столбец search_vector с GIN-индексом,
+# в SQLite — таблица FTS5 recipes_recipe_fts.
+POSTGRES_TSQUERY = 'websearch_to_tsquery(%s, %s)'
+POSTGRES_MATCHED = (
+    'SELECT id FROM recipes_recipe WHERE search_vector @@ '
+    + POSTGRES_TSQUERY
+)
+POSTGRES_RANK = f'ts_rank(recipes_recipe.search_vector, {POSTGRES_TSQUERY})'
+SQLITE_MATCHED = (
+    'SELECT rowid FROM recipes_recipe_fts WHERE recipes_recipe_fts MATCH %s'
+)
+# bm25 тем меньше, чем лучше совпадение; название весит больше описания.
+SQLITE_RANK = (
+    '(SELECT -bm25(recipes_recipe_fts, 10.0, 1.0) FROM recipes_recipe_fts '
+    'WHERE recipes_recipe_fts MATCH %s AND rowid = recipes_recipe.id)'
+)
+
+
+class IngredientIndex:
+    """Префиксный индекс ингредиентов в памяти процесса.
+
+    Используется вместо индексов PostgreSQL при работе с SQLite и
+    перестраивается при смене версии справочника ингредиентов.
+    """
+
+    def __init__(self):
+        self._source = None
+        self._entries = None
+        self._keys = None
+
+    def load(self):
+        source = ingredient_cache.list()
+        if source is not self._source:
+            self._entries = sorted(
+                (item['name'].lower(), item['id'], item['name'],
+                 item['measurement_unit'])
+                for item in source
+            )
+            self._keys = [entry[0] for entry in self._entries]
+            self._source = source
+        return self._entries
+
+    def search(self, query, limit=INGREDIENT_SEARCH_LIMIT):
+        """Сначала совпадения по началу названия, затем по подстроке."""
+
+        entries = self.load()
+        query = query.lower()
+        found = []
+        for entry in entries[bisect_left(self._keys, query):]:
+            if len(found) >= limit or not entry[0].startswith(query):
+                break
+            found.append(entry)
+        if len(found) < limit:
+            for entry in entries:
+                if query in entry[0] and not entry[0].startswith(query):
+                    found.append(entry)
+                    if len(found) >= limit:
+                        break
+        return [
+            Ingredient(id=pk, name=name, measurement_unit=measurement_unit)
+            for _, pk, name, measurement_unit in found
+        ]
+
+
+ingredient_index = IngredientIndex()
+
+
+def search_ingredients(query, limit=INGREDIENT_SEARCH_LIMIT):
+    """Поиск ингредиентов для автодополнения."""
+
+    if connection.vendor != 'postgresql':
+        return ingredient_index.search(query, limit)
+
+    # Оба запроса обслуживаются индексами по UPPER(name),
+    # см. миграцию recipes.0006.
+    found = list(Ingredient.objects.filter(
+        name__istartswith=query).order_by('name')[:limit])
+    if len(found) < limit:
+        found += Ingredient.objects.filter(name__icontains=query).exclude(
+            name__istartswith=query).order_by('name')[:limit - len(found)]
+    return found
+
+
+def fts5_query(query):
+    """Запрос FTS5 из слов пользователя: все слова, с любым окончанием."""
+
+    return ' '.join(f'"{word}"*' for word in SEARCH_WORD.findall(query))
+
+
+def search_recipes(queryset, query):
+    """Рецепты, подходящие под запрос, по убыванию релевантности.
+
+    Релевантность доступна как search_rank.
+    """
+
+    if connection.vendor == 'postgresql':
+        params = (RECIPE_SEARCH_CONFIG, query)
+        matched = RawSQL(POSTGRES_MATCHED, params)
+        rank = RawSQL(POSTGRES_RANK, params, output_field=FloatField())
+    else:
+        match = fts5_query(query)
+        if not match:
+            return queryset.none()
+        matched = RawSQL(SQLITE_MATCHED, (match,))
+        rank = RawSQL(SQLITE_RANK, (match,), output_field=FloatField())
+    return queryset.filter(pk__in=matched).annotate(
+        search_rank=rank).order_by(*SEARCH_ORDERING)
@@ -1,13 +1,25 @@
 import base64
+import binascii
+import json
+import re
 
 from django.contrib.auth import get_user_model
-from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import transaction
+from django.core.cache import cache
+from django.db.models import Manager, prefetch_related_objects
+from django.http import QueryDict
 from rest_framework import serializers
 from djoser.serializers import (
     UserCreateSerializer as DjoserUserCreateSerializer)
 from djoser.serializers import UserSerializer as DjoserUserSerializer
 
+from foodgram.metrics import record_cache
+from foodgram.middleware import timed
 from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag, Follow
+from .caches import (author_version_name, get_versions, ingredient_cache,
+                     reference_row, tag_cache)
+from .images import derivative_name
 from .validators import validate_ingredients, validate_tags
 
 User = get_user_model()
@@ -15,6 +27,29 @@ User = get_user_model()
 MIN_VALUE = 1
 MAX_VALUE = 32000
 
+RECIPE_PREFETCH = ('tags', 'ingredients__ingredient')
+RECIPE_FRAGMENT_TIMEOUT = 24 * 60 * 60
+VIEWER_FIELDS = ('is_favorited', 'is_in_shopping_cart')
+
+MAX_IMAGE_SIZE = 20 * 1024 * 1024
+BASE64_SEPARATOR = ';base64,'
+# Кратно 4, чтобы каждая порция декодировалась независимо.
+BASE64_CHUNK_SIZE = 64 * 1024
+NOT_BASE64 = re.compile(r'[^A-Za-z0-9+/=]')
+
+
+class TimedSerializerMixin:
+    """Построение ответа учитывается в Server-Timing как serialize."""
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
+
 
 class UserCreateSerializer(DjoserUserCreateSerializer):
     """Создание пользователя."""
@@ -25,17 +60,44 @@ class UserCreateSerializer(DjoserUserCreateSerializer):
                   'password']
 
 
-class UserSerializer(DjoserUserSerializer):
+class ImageDerivativeField(serializers.Field):
+    """Ссылка на уменьшенную копию изображения.
+
+    Пока копии нет (изображение загружено раньше или не открылось),
+    отдаётся ссылка на оригинал.
+    """
+
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        name = derivative_name(value.name, self.variant)
+        if not value.storage.exists(name):
+            name = value.name
+        url = value.storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class UserSerializer(TimedSerializerMixin, DjoserUserSerializer):
     """Отображение пользователя."""
 
     is_subscribed = serializers.SerializerMethodField()
+    avatar_thumbnail = ImageDerivativeField('thumbnail', source='avatar')
 
     class Meta:
         model = User
+        list_serializer_class = TimedListSerializer
         fields = ['email', 'id', 'username', 'first_name', 'last_name',
-                  'is_subscribed', 'avatar']
+                  'is_subscribed', 'avatar', 'avatar_thumbnail']
 
     def get_is_subscribed(self, author):
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
         user = self.context['request'].user
         if not user.is_authenticated:
             return False
@@ -43,15 +105,58 @@ class UserSerializer(DjoserUserSerializer):
 
 
 class Base64ImageField(serializers.ImageField):
-    """Конвертация изображения."""
+    """Изображение в base64 или файлом из multipart-запроса.
+
+    base64 декодируется порциями во временный файл на диске, размер
+    проверяется до декодирования. Файл отдаётся как TemporaryUploadedFile:
+    проверка изображения читает его по пути, не копируя в память.
+    """
+
+    default_error_messages = {
+        'max_size': 'Размер изображения не должен превышать {max_size} байт.',
+        'invalid_base64': 'Некорректное изображение в формате base64.',
+    }
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = self.decode_base64(data)
+        elif getattr(data, 'size', 0) > MAX_IMAGE_SIZE:
+            self.fail('max_size', max_size=MAX_IMAGE_SIZE)
         return super().to_internal_value(data)
 
+    def decode_base64(self, data):
+        header_end = data.find(BASE64_SEPARATOR)
+        if header_end == -1:
+            self.fail('invalid_base64')
+        ext = data[:header_end].split('/')[-1]
+        start = header_end + len(BASE64_SEPARATOR)
+        if (len(data) - start) * 3 // 4 > MAX_IMAGE_SIZE:
+            self.fail('max_size', max_size=MAX_IMAGE_SIZE)
+
+        file = TemporaryUploadedFile(
+            'temp.' + ext, 'image/' + ext, None, None)
+        # Как и b64decode, пропускаем символы вне алфавита (переносы строк
+        # в MIME-base64); хвост, не кратный 4, переносим в следующую порцию.
+        pending = ''
+        try:
+            for position in range(start, len(data), BASE64_CHUNK_SIZE):
+                pending += NOT_BASE64.sub(
+                    '', data[position:position + BASE64_CHUNK_SIZE])
+                ready = len(pending) - len(pending) % 4
+                file.write(base64.b64decode(pending[:ready]))
+                pending = pending[ready:]
+            file.write(base64.b64decode(pending))
+        except binascii.Error:
+            file.close()
+            self.fail('invalid_base64')
+        file.size = file.tell()
+        file.seek(0)
+        request = self.context.get('request')
+        if request is not None:
+            # Как и файлы из multipart, закрывается по окончании запроса.
+            request._request.FILES.appendlist(self.field_name, file)
+        return file
+
 
 class AvatarSerializer(serializers.ModelSerializer):
     """Аватар пользователя."""
@@ -106,14 +211,25 @@ class RecipeIngredientsSerializer(serializers.ModelSerializer):
         fields = ['id', 'amount']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(TimedListSerializer):
+    """Список рецептов с общим запросом к кешу представлений."""
+
+    def to_representation(self, data):
+        recipes = data.all() if isinstance(data, Manager) else data
+        return self.child.represent_many(list(recipes))
+
+
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Рецепты, основная модель."""
 
-    ingredients = RecipeIngredientsSerializer(many=True, required=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True, queryset=Tag.objects.all(), write_only=True)
+    ingredients = RecipeIngredientsSerializer(
+        many=True, required=True, write_only=True)
+    tags = serializers.ListField(
+        child=serializers.IntegerField(), write_only=True)
     author = UserSerializer(read_only=True)
     image = Base64ImageField()
+    image_thumbnail = ImageDerivativeField('thumbnail', source='image')
+    image_webp = ImageDerivativeField('webp', source='image')
     cooking_time = serializers.IntegerField(
         max_value=MAX_VALUE,
         min_value=MIN_VALUE
@@ -124,17 +240,43 @@ class RecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = ['id', 'tags', 'author', 'ingredients', 'image',
-                  'text', 'name', 'cooking_time', 'is_favorited',
-                  'is_in_shopping_cart']
+                  'image_thumbnail', 'image_webp', 'text', 'name',
+                  'cooking_time', 'is_favorited', 'is_in_shopping_cart']
+        list_serializer_class = RecipeListSerializer
 
     def get_is_favorited(self, recipe):
+        if hasattr(recipe, 'is_favorited'):
+            return recipe.is_favorited
         user = self.context['request'].user  # user.id для анонима = None
         return recipe.favorites.filter(user=user.id).exists()
 
     def get_is_in_shopping_cart(self, recipe):
+        if hasattr(recipe, 'is_in_shopping_cart'):
+            return recipe.is_in_shopping_cart
         user = self.context['request'].user
         return recipe.shopping_cart.filter(user=user.id).exists()
 
+    def to_internal_value(self, data):
+        """Поддержка multipart: ingredients и tags передаются как JSON."""
+
+        if isinstance(data, QueryDict):
+            data = self.parse_multipart(data)
+        return super().to_internal_value(data)
+
+    def parse_multipart(self, data):
+        parsed = data.dict()
+        for field in ('ingredients', 'tags'):
+            values = data.getlist(field)
+            if len(values) == 1 and values[0].lstrip().startswith('['):
+                try:
+                    values = json.loads(values[0])
+                except ValueError:
+                    raise serializers.ValidationError(
+                        {field: 'Некорректный JSON.'})
+            if field in data:
+                parsed[field] = values
+        return parsed
+
     def validate_tags(self, data):
         """Проверка списка тегов."""
 
@@ -151,15 +293,14 @@ class RecipeSerializer(serializers.ModelSerializer):
         RecipeIngredients.objects.bulk_create(
             RecipeIngredients(
                 recipe=recipe,
-                ingredient=Ingredient.objects.get(
-                    id=ingredient_data['ingredient']['id']
-                ),
+                ingredient_id=ingredient_data['ingredient']['id'],
                 amount=ingredient_data['amount']
             )
             for ingredient_data in ingredients_data)
 
         return recipe
 
+    @transaction.atomic
     def create(self, validated_data):
         """Метод для создания рецепта."""
 
@@ -171,6 +312,7 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         return self.fill_with_ingredients(recipe, ingredients_data)
 
+    @transaction.atomic
     def update(self, recipe, validated_data):
         """Метод для обновления рецепта."""
 
@@ -187,31 +329,129 @@ class RecipeSerializer(serializers.ModelSerializer):
         ingredients_data = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags')
 
+        for attr, value in validated_data.items():
+            setattr(recipe, attr, value)
         recipe.save()
 
-        # Обновляем теги, если они были переданы
-        if tags_data is not None:
-            recipe.tags.set(tags_data)
+        self.update_tags(recipe, tags_data)
+        self.update_ingredients(recipe, ingredients_data)
+        return recipe
 
-        # Обновляем ингредиенты
-        if ingredients_data is not None:
-            # Удаляем старые ингредиенты
-            recipe.ingredients.all().delete()
-
-        return self.fill_with_ingredients(recipe, ingredients_data)
+    def update_tags(self, recipe, tags_data):
+        """Добавление новых и удаление убранных тегов рецепта."""
+
+        current = set(recipe.tags.values_list('id', flat=True))
+        new = set(tags_data)
+        if current - new:
+            recipe.tags.remove(*(current - new))
+        if new - current:
+            recipe.tags.add(*(new - current))
+
+    def update_ingredients(self, recipe, ingredients_data):
+        """Обновление только изменившихся ингредиентов рецепта."""
+
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in RecipeIngredients.objects.filter(
+                recipe=recipe)
+        }
+        new = {
+            ingredient_data['ingredient']['id']: ingredient_data['amount']
+            for ingredient_data in ingredients_data
+        }
+
+        removed = current.keys() - new.keys()
+        if removed:
+            RecipeIngredients.objects.filter(
+                recipe=recipe, ingredient_id__in=removed).delete()
+
+        changed = []
+        for ingredient_id, amount in new.items():
+            recipe_ingredient = current.get(ingredient_id)
+            if recipe_ingredient and recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        if changed:
+            RecipeIngredients.objects.bulk_update(changed, ['amount'])
+
+        self.fill_with_ingredients(recipe, [
+            ingredient_data for ingredient_data in ingredients_data
+            if ingredient_data['ingredient']['id'] not in current
+        ])
 
     def to_representation(self, instance):
         """Метод для отображения всех полей ингредиентов."""
 
+        return self.represent_many([instance])[0]
+
+    def represent_many(self, recipes):
+        """Представление рецептов с кешем общей для всех части.
+
+        Кешируется всё, кроме is_favorited, is_in_shopping_cart и
+        author.is_subscribed; ключ меняется вместе с рецептом, автором,
+        тегами и ингредиентами.
+        """
+
+        for recipe in recipes:
+            if hasattr(recipe, 'author_is_subscribed'):
+                recipe.author.is_subscribed = recipe.author_is_subscribed
+        keys = self.fragment_keys(recipes)
+        fragments = cache.get_many(keys.values())
+        missing = [recipe for recipe in recipes
+                   if keys[recipe.pk] not in fragments]
+        record_cache('recipe_fragments', hits=len(fragments),
+                     misses=len(missing))
+        if missing:
+            prefetch_related_objects(missing, *RECIPE_PREFETCH)
+            built = {}
+            for recipe in missing:
+                built[keys[recipe.pk]] = self.build_fragment(recipe)
+            cache.set_many(built, RECIPE_FRAGMENT_TIMEOUT)
+            fragments.update(built)
+
+        user_serializer = self.fields['author']
+        representations = []
+        for recipe in recipes:
+            representation = dict(fragments[keys[recipe.pk]])
+            representation['is_favorited'] = self.get_is_favorited(recipe)
+            representation['is_in_shopping_cart'] = (
+                self.get_is_in_shopping_cart(recipe))
+            representation['author'] = {
+                **representation['author'],
+                'is_subscribed': user_serializer.get_is_subscribed(
+                    recipe.author),
+            }
+            representations.append(representation)
+        return representations
+
+    def fragment_keys(self, recipes):
+        host = self.context['request'].build_absolute_uri('/')
+        versions = get_versions(
+            ['tags', 'ingredients',
+             *{author_version_name(recipe.author_id) for recipe in recipes}])
+        return {
+            recipe.pk: 'recipe:{}:{}:{}:{}:{}:{}'.format(
+                host, recipe.pk, recipe.updated_at.timestamp(),
+                versions[author_version_name(recipe.author_id)],
+                versions['tags'], versions['ingredients'])
+            for recipe in recipes
+        }
+
+    def build_fragment(self, instance):
+        # Теги и ингредиенты берутся из уже загруженных строк, а не из
+        # справочников процесса: те могут отставать от версии в ключе.
         representation = super().to_representation(instance)
-        representation['tags'] = TagSerializer(
-            instance.tags.all(), many=True).data
+        for field in VIEWER_FIELDS:
+            representation.pop(field)
+        representation['author'] = dict(representation['author'])
+        representation['author'].pop('is_subscribed')
+        representation['tags'] = [
+            reference_row(tag, tag_cache.fields)
+            for tag in instance.tags.all()]
         representation['ingredients'] = [
             {
-                'id': recipe_ingredient.ingredient.id,
-                'name': recipe_ingredient.ingredient.name,
-                'measurement_unit': recipe_ingredient.
-                ingredient.measurement_unit,
+                **reference_row(recipe_ingredient.ingredient,
+                                ingredient_cache.fields),
                 'amount': recipe_ingredient.amount
             }
             for recipe_ingredient in instance.ingredients.all()
@@ -219,48 +459,62 @@ class RecipeSerializer(serializers.ModelSerializer):
         return representation
 
 
-class ShortRecipeSerializer(serializers.ModelSerializer):
+class ShortRecipeSerializer(TimedSerializerMixin,
+                            serializers.ModelSerializer):
     """Избранные рецепты."""
 
+    image_thumbnail = ImageDerivativeField('thumbnail', source='image')
+    image_webp = ImageDerivativeField('webp', source='image')
+
     class Meta:
         model = Recipe
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['id', 'name', 'image', 'image_thumbnail', 'image_webp',
+                  'cooking_time']
+
+
+def get_recipes_limit(request):
+    """Значение recipes_limit из запроса или None."""
 
+    recipes_limit = request.query_params.get('recipes_limit')
+    if recipes_limit is not None and recipes_limit.isdigit():
+        return int(recipes_limit)
+    return None
 
-class FollowSerializer(serializers.ModelSerializer):
+
+class FollowSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Кастомный пользователь."""
 
-    recipes = ShortRecipeSerializer(many=True, read_only=True)
-    recipes_count = serializers.IntegerField(source='recipes.count',
-                                             read_only=True)
+    recipes = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
     is_subscribed = serializers.BooleanField(default=True)
+    avatar_thumbnail = ImageDerivativeField('thumbnail', source='avatar')
 
     class Meta:
         model = User
+        list_serializer_class = TimedListSerializer
         fields = ['email', 'id', 'username', 'first_name', 'last_name',
-                  'is_subscribed', 'recipes', 'avatar', 'recipes_count']
+                  'is_subscribed', 'recipes', 'avatar', 'avatar_thumbnail',
+                  'recipes_count']
+
+    def get_recipes(self, author):
+        """Рецепты автора с учетом лимита recipes_limit."""
+        recipes = getattr(author, 'limited_recipes', None)
+        if recipes is None:
+            recipes = author.recipes.all()
+            recipes_limit = get_recipes_limit(self.context['request'])
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
+        return ShortRecipeSerializer(
+            recipes, many=True, context=self.context).data
 
     def validate_subscription(self):
-        """Проверка подписки на самого себя."""
+        """Проверка подписки на самого себя.
+
+        Повторная подписка отсекается уникальным ограничением при вставке.
+        """
         request = self.context.get('request')
 
         if request.user == self.instance:
             raise serializers.ValidationError(
                 {'detail': 'Подписка и отписка от самого себя невозможна'}
             )
-        if Follow.objects.filter(author=self.instance,
-                                 subscriber=request.user).exists():
-            raise serializers.ValidationError(
-                {'detail': 'Вы уже подписаны на этого пользователя'}
-            )
-
-    def to_representation(self, instance):
-        """Преобразует объект в словарь с учетом лимита рецептов."""
-        representation = super().to_representation(instance)
-        request = self.context.get('request')
-        recipes_limit = request.query_params.get('recipes_limit')
-
-        if recipes_limit is not None:
-            representation['recipes'] = representation[
-                'recipes'][:int(recipes_limit)]
-        return representation
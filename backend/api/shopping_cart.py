@@ -0,0 +1,105 @@
+import csv
+import io
+
+from django.conf import settings
+from django.db.models import Sum
+
+from recipes.models import RecipeIngredients
+
+CHUNK_SIZE = 500
+PDF_CHUNK_SIZE = 64 * 1024
+PDF_FONT_NAME = 'ShoppingCartFont'
+PDF_FONT_SIZE = 12
+PDF_LINE_HEIGHT = 18
+PDF_MARGIN = 50
+
+TITLE = 'Список ингредиентов:'
+
+
+def shopping_cart_totals(user):
+    """Суммарное количество ингредиентов из списка покупок пользователя.
+
+    Один сгруппированный запрос по рецептам из корзины, строки
+    читаются из курсора порциями.
+    """
+
+    return (
+        RecipeIngredients.objects
+        .filter(recipe__shopping_cart__user=user)
+        .values('ingredient__name', 'ingredient__measurement_unit')
+        .annotate(total=Sum('amount'))
+        .order_by('ingredient__name')
+        .values_list('ingredient__name', 'ingredient__measurement_unit',
+                     'total')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def render_txt(totals):
+    """Список покупок в виде текста."""
+
+    yield f'{TITLE}\n'
+    for name, unit, amount in totals:
+        yield f'• {name}: {amount}{unit}\n'
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(totals):
+    """Список покупок в формате CSV."""
+
+    writer = csv.writer(Echo())
+    yield writer.writerow(['Ингредиент', 'Количество', 'Единица измерения'])
+    for name, unit, amount in totals:
+        yield writer.writerow([name, amount, unit])
+
+
+def register_pdf_font():
+    """Регистрация шрифта с поддержкой кириллицы."""
+
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(
+            TTFont(PDF_FONT_NAME, settings.SHOPPING_CART_PDF_FONT))
+
+
+def render_pdf(totals):
+    """Список покупок в формате PDF.
+
+    Документ собирается постранично, клиенту отдаётся частями.
+    """
+
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    register_pdf_font()
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    pdf.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+    y = height - PDF_MARGIN
+    pdf.drawString(PDF_MARGIN, y, TITLE)
+    for name, unit, amount in totals:
+        y -= PDF_LINE_HEIGHT
+        if y < PDF_MARGIN:
+            pdf.showPage()
+            pdf.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+            y = height - PDF_MARGIN
+        pdf.drawString(PDF_MARGIN, y, f'• {name}: {amount}{unit}')
+    pdf.save()
+    buffer.seek(0)
+    yield from iter(lambda: buffer.read(PDF_CHUNK_SIZE), b'')
+
+
+EXPORT_FORMATS = {
+    'txt': (render_txt, 'text/plain; charset=utf-8'),
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+    'pdf': (render_pdf, 'application/pdf'),
+}
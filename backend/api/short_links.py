@@ -0,0 +1,160 @@
+import atexit
+import logging
+import os
+import secrets
+import string
+import threading
+from collections import Counter, OrderedDict
+
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+from foodgram.metrics import record_cache
+from recipes.models import ShortLink
+
+ALPHABET = string.digits + string.ascii_letters
+CODE_LENGTH = 6
+CREATE_ATTEMPTS = 5
+LOCAL_CACHE_SIZE = 1024
+SHARED_CACHE_TIMEOUT = 24 * 60 * 60
+HITS_FLUSH_INTERVAL = 10
+
+logger = logging.getLogger(__name__)
+
+
+def generate_code():
+    """Случайный код base62, не раскрывающий id рецепта."""
+
+    return ''.join(secrets.choice(ALPHABET) for _ in range(CODE_LENGTH))
+
+
+def get_or_create_code(recipe):
+    code = ShortLink.objects.filter(recipe=recipe).values_list(
+        'code', flat=True).first()
+    if code:
+        return code
+    for _ in range(CREATE_ATTEMPTS):
+        code = generate_code()
+        try:
+            with transaction.atomic():
+                ShortLink.objects.create(recipe=recipe, code=code)
+            return code
+        except IntegrityError:
+            # Совпал код или ссылку уже создал параллельный запрос.
+            existing = ShortLink.objects.filter(recipe=recipe).values_list(
+                'code', flat=True).first()
+            if existing:
+                return existing
+    raise IntegrityError('Не удалось подобрать свободный код ссылки.')
+
+
+class LRUCache:
+    """Ограниченный по размеру кеш в памяти процесса."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+local_links = LRUCache(LOCAL_CACHE_SIZE)
+
+
+def shared_key(code):
+    return f'short-link:{code}'
+
+
+def resolve(code):
+    """id рецепта по коду: память процесса, общий кеш, затем база."""
+
+    recipe_id = local_links.get(code)
+    if recipe_id is None:
+        recipe_id = cache.get(shared_key(code))
+    record_cache('short_links', hits=recipe_id is not None,
+                 misses=recipe_id is None)
+    if recipe_id is None:
+        recipe_id = ShortLink.objects.filter(code=code).values_list(
+            'recipe_id', flat=True).first()
+        if recipe_id is None:
+            return None
+        cache.set(shared_key(code), recipe_id, SHARED_CACHE_TIMEOUT)
+    local_links.set(code, recipe_id)
+    return recipe_id
+
+
+def forget(code):
+    local_links.delete(code)
+    cache.delete(shared_key(code))
+
+
+class HitCounter:
+    """Счётчик переходов, сбрасываемый в базу пачками в фоне.
+
+    Фоновый поток пишет накопленное раз в interval секунд, остаток
+    записывается при завершении процесса.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = None
+        atexit.register(self.stop)
+
+    def add(self, code):
+        with self._lock:
+            self._pending[code] += 1
+            # Поток запускается в том процессе, который считает переходы:
+            # после fork потоки родителя в дочернем процессе не работают.
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run,
+                                                daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stopped.wait(self.interval):
+                self.flush()
+        finally:
+            connection.close()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        try:
+            for code, hits in pending.items():
+                ShortLink.objects.filter(code=code).update(
+                    hits=F('hits') + hits)
+        except Exception:
+            logger.exception('Не удалось записать переходы по ссылкам')
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(self.interval)
+        self.flush()
+
+
+hit_counter = HitCounter(HITS_FLUSH_INTERVAL)
@@ -0,0 +1,117 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.counters import change_counters
+from recipes.models import (FavoriteRecipe, Follow, Ingredient, Recipe,
+                            ShoppingCart, ShortLink, Tag)
+from users.models import User
+from . import short_links
+from .authentication import forget_tokens, forget_user_tokens
+from .caches import (author_version_name, bump_version, ingredient_cache,
+                     tag_cache, user_version_name)
+from .images import (AVATAR_VARIANTS, RECIPE_IMAGE_VARIANTS,
+                     generate_derivatives)
+
+
+def bump_on_commit(*names):
+    """Смена версий после коммита транзакции.
+
+    До коммита другие запросы видят старые данные и закешировали бы их
+    под новой версией.
+    """
+    for name in names:
+        transaction.on_commit(partial(bump_version, name))
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_tag_cache(**kwargs):
+    transaction.on_commit(tag_cache.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredient_cache(**kwargs):
+    transaction.on_commit(ingredient_cache.invalidate)
+
+
+@receiver(post_delete, sender=Ingredient)
+def rebuild_pantry_index(**kwargs):
+    """Ингредиент каскадом удаляется из рецептов без смены их updated_at."""
+    bump_on_commit('recipes', 'pantry')
+
+
+@receiver(post_save, sender=Recipe)
+def make_recipe_image_derivatives(instance, **kwargs):
+    generate_derivatives(instance.image, RECIPE_IMAGE_VARIANTS)
+
+
+@receiver(post_save, sender=User)
+def make_avatar_derivatives(instance, **kwargs):
+    generate_derivatives(instance.avatar, AVATAR_VARIANTS)
+
+
+@receiver(post_delete, sender=ShortLink)
+def forget_short_link(instance, **kwargs):
+    transaction.on_commit(partial(short_links.forget, instance.code))
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def bump_recipes_version(**kwargs):
+    bump_on_commit('recipes')
+
+
+@receiver(post_save, sender=User)
+def bump_authors_version(instance, update_fields=None, **kwargs):
+    """Данные автора входят в ответ по рецептам."""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_on_commit('recipes', author_version_name(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=FavoriteRecipe)
+@receiver([post_save, post_delete], sender=ShoppingCart)
+def bump_user_recipes_version(instance, **kwargs):
+    bump_on_commit(user_version_name(instance.user_id))
+
+
+@receiver([post_save, post_delete], sender=FavoriteRecipe)
+def bump_popularity_version(**kwargs):
+    bump_on_commit('popularity')
+
+
+@receiver([post_save, post_delete], sender=Follow)
+def bump_subscriber_version(instance, **kwargs):
+    bump_on_commit(user_version_name(instance.subscriber_id))
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(instance, **kwargs):
+    transaction.on_commit(partial(forget_tokens, [instance.key]))
+
+
+@receiver(post_save, sender=User)
+def forget_changed_user_tokens(instance, update_fields=None, **kwargs):
+    """Пароль и признак активности должны проверяться заново."""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(partial(forget_user_tokens, instance.pk))
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Follow)
+def increment_counters(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_counters(sender, instance, 1)
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Follow)
+def decrement_counters(sender, instance, **kwargs):
+    change_counters(sender, instance, -1)
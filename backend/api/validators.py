@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from recipes.models import Ingredient
+from recipes.models import Ingredient, Tag
 
 
 def validate_empty_list(data, message):
@@ -16,6 +16,16 @@ def validate_tags(data):
 
     if len(set(data)) != len(data):
         raise serializers.ValidationError("Не должно быть дубликатов.")
+
+    existing_tags = Tag.objects.filter(
+        id__in=data).values_list('id', flat=True)
+    missing_tags = set(data) - set(existing_tags)
+
+    if missing_tags:
+        raise serializers.ValidationError(
+            f"Теги с ID {', '.join(map(str, missing_tags))} "
+            "не найдены в базе данных."
+        )
     return data
 
 
@@ -1,9 +1,13 @@
 from django.contrib.auth import get_user_model
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
+from django.db.models import (BooleanField, Exists, OuterRef, Prefetch, Value,
+                              prefetch_related_objects)
+from django.db.models.expressions import RawSQL
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
-from rest_framework import filters, generics, status, viewsets
+from rest_framework import generics, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import (IsAuthenticatedOrReadOnly,
@@ -12,8 +16,14 @@ from rest_framework.response import Response
 
 from recipes.models import (Ingredient, FavoriteRecipe, Follow,
                             Recipe, ShoppingCart, Tag)
-from .filters import RecipeFilter
+from . import short_links
+from .caches import ingredient_cache, tag_cache, user_version_name
+from .conditional import ConditionalGetMixin
+from .filters import RecipeFilter, RecipeSearchFilter
+from .pagination import RecipePagination, SubscriptionPagination
+from .pantry import pantry_index
 from .permissions import IsAuthorOrReadOnly
+from .relations import add_relation, remove_relation, url_pk
 from .serializers import (
     AvatarSerializer,
     ShortRecipeSerializer,
@@ -21,60 +31,118 @@ from .serializers import (
     IngredientSerializer,
     RecipeSerializer,
     TagSerializer,
+    get_recipes_limit,
 )
+from .search import search_ingredients
+from .shopping_cart import EXPORT_FORMATS, shopping_cart_totals
 
 User = get_user_model()
 
-BASE_URL = '127.0.0.1'
 
+def short_link_redirect(request, code):
+    """Переход по короткой ссылке на страницу рецепта."""
+    recipe_id = short_links.resolve(code)
+    if recipe_id is None:
+        raise Http404
+    short_links.hit_counter.add(code)
+    return redirect(f'/recipes/{recipe_id}')
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """Рецепты."""
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = [IsAuthorOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, RecipeSearchFilter]
     filterset_class = RecipeFilter
+    pagination_class = RecipePagination
+    version_names = ('recipes', 'tags', 'ingredients')
+
+    def get_version_names(self, request):
+        """Общие версии, версия избранного/корзины/подписок и популярности."""
+        names = super().get_version_names(request)
+        if request.user.is_authenticated:
+            names.append(user_version_name(request.user.id))
+        if request.query_params.get('ordering') == 'popular':
+            names.append('popularity')
+        return names
+
+    def get_version_stamps(self, request):
+        stamps = super().get_version_stamps(request)
+        if self.action == 'retrieve':
+            try:
+                updated_at = Recipe.objects.filter(
+                    pk=self.kwargs['pk']).values_list(
+                        'updated_at', flat=True).first()
+            except (TypeError, ValueError):
+                # Некорректный id: 404 вернёт обычная обработка.
+                updated_at = None
+            if updated_at is None:
+                return []
+            stamps.append(updated_at.timestamp())
+        return stamps
 
     def perform_create(self, serializer):
         """Создание рецепта, привязка автора."""
         serializer.save(author=self.request.user)
 
-    def get_serializer_context(self):
-        context = super().get_serializer_context()
-        return context
+    def get_queryset(self):
+        """Рецепты с флагами текущего пользователя."""
+        user = self.request.user
+        # Теги и ингредиенты подгружает сериализатор только для рецептов,
+        # которых нет в кеше представлений.
+        queryset = Recipe.objects.select_related('author')
+        if not user.is_authenticated:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+                author_is_subscribed=Value(False,
+                                           output_field=BooleanField()),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(FavoriteRecipe.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            author_is_subscribed=Exists(Follow.objects.filter(
+                subscriber=user, author=OuterRef('author'))),
+        )
 
     @action(detail=True, methods=['get'], url_path='get-link')
     def get_link(self, request, pk=None):
+        """Короткая ссылка на рецепт."""
+        recipe = get_object_or_404(Recipe.objects.only('id'), pk=pk)
+        code = short_links.get_or_create_code(recipe)
         return Response(
-            {'short-link': f'{BASE_URL}/{pk}'},
+            {'short-link': request.build_absolute_uri(
+                reverse('short-link', args=[code]))},
             status=status.HTTP_200_OK
         )
 
     def shopping_cart_and_favorite(self, request, model, pk):
         """Добавление рецепта в избранное."""
-        recipe = get_object_or_404(Recipe, pk=pk)
         user = request.user
 
         if request.method == 'POST':
-            if model.objects.filter(user=user, recipe=recipe).exists():
-                return Response(
-                    {'detail': 'Вы уже добавили этот рецепт.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            model.objects.create(user=user, recipe=recipe)
-            serializer = ShortRecipeSerializer(recipe)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            recipe = get_object_or_404(Recipe, pk=pk)
+            if add_relation(model, user_id=user.id, recipe_id=recipe.id):
+                serializer = ShortRecipeSerializer(recipe)
+                return Response(serializer.data,
+                                status=status.HTTP_201_CREATED)
+            return Response(
+                {'detail': 'Вы уже добавили этот рецепт.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         elif request.method == 'DELETE':
-            if not model.objects.filter(user=user, recipe=recipe).exists():
-                return Response(
-                    {'detail': 'Рецепт отсутствует в вашем списке.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            model.objects.filter(user=user, recipe=recipe).delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
+            if remove_relation(model, user_id=user.id,
+                               recipe_id=url_pk(Recipe, pk)):
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            get_object_or_404(Recipe, pk=pk)
+            return Response(
+                {'detail': 'Рецепт отсутствует в вашем списке.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
     @action(detail=True, methods=['post', 'delete'])
     def favorite(self, request, pk=None):
@@ -84,60 +152,128 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def shopping_cart(self, request, pk=None):
         return self.shopping_cart_and_favorite(request, ShoppingCart, pk)
 
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'],
+            permission_classes=[IsAuthenticated])
     def download_shopping_cart(self, request):
-        recipes = self.queryset
-        ingredient_totals = {}
-
-        for rec in recipes:
-            for recipe_ingredient in rec.ingredients.all():
-                ingredient_name = recipe_ingredient.ingredient.name
-                amount = recipe_ingredient.amount
-                measurement_unit = (recipe_ingredient.ingredient
-                                    .measurement_unit)
-
-                if ingredient_name in ingredient_totals:
-                    ingredient_totals[ingredient_name]['amount'] += amount
-                else:
-                    ingredient_totals[ingredient_name] = {
-                        'amount': amount,
-                        'unit': measurement_unit
-                    }
-
-        recipe_text = "Список ингредиентов:\n"
-        for ingredient_name, data in ingredient_totals.items():
-            recipe_text += (
-                f"• {ingredient_name}: "
-                f"{data['amount']}{data['unit']}\n"
+        """Выгрузка списка покупок в формате txt, csv или pdf."""
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in EXPORT_FORMATS:
+            return Response(
+                {'file_format': 'Доступные форматы: '
+                                f'{", ".join(EXPORT_FORMATS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-
-        response = HttpResponse(recipe_text, content_type='text/plain')
-        response[
-            'Content-Disposition'] = 'attachment; filename="shopping_cart.txt"'
+        render, content_type = EXPORT_FORMATS[file_format]
+        response = StreamingHttpResponse(
+            render(shopping_cart_totals(request.user)),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_cart.{file_format}"')
         return response
 
+    @action(detail=False, methods=['get'],
+            pagination_class=LimitOffsetPagination)
+    def pantry(self, request):
+        """Рецепты из имеющихся ингредиентов по доле покрытия.
+
+        ?ingredients=1,2,3 — id ингредиентов, ?max_missing=N — не больше
+        N недостающих.
+        """
+        try:
+            ingredient_ids = [
+                int(pk) for pk in
+                request.query_params.get('ingredients', '').split(',')
+                if pk.strip()
+            ]
+            max_missing = request.query_params.get('max_missing')
+            if max_missing is not None:
+                max_missing = int(max_missing)
+        except ValueError:
+            return Response(
+                {'detail': 'ingredients — список id через запятую, '
+                           'max_missing — целое число.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        recipe_ids, coverage, missing = pantry_index.search(
+            ingredient_ids, max_missing)
+        ranks = {
+            pk: (share, count) for pk, share, count in
+            zip(recipe_ids.tolist(), coverage.tolist(), missing.tolist())
+        }
+        page = self.paginate_queryset(recipe_ids.tolist())
+        recipes = self.get_queryset().in_bulk(page)
+        data = self.get_serializer(
+            [recipes[pk] for pk in page if pk in recipes], many=True).data
+        for item in data:
+            item['coverage'], item['missing'] = ranks[item['id']]
+        return self.get_paginated_response(data)
+
+
+class ReferenceViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    """Справочник, отдаваемый из кеша в памяти процесса."""
+    pagination_class = None
+    http_method_names = ['get']
+    reference_cache = None
+    cache_control = {'public': True, 'max_age': 300}
+
+    def get_version_names(self, request):
+        return [self.reference_cache.name]
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(request, self.list_reference)
+
+    def list_reference(self, request):
+        return Response(self.reference_cache.list())
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(request, self.retrieve_reference,
+                                kwargs['pk'])
+
+    def retrieve_reference(self, request, pk):
+        """Запись справочника из кеша или 404."""
+        item = (self.reference_cache.get(int(pk))
+                if str(pk).isdigit() else None)
+        if item is None:
+            raise Http404
+        return Response(item)
 
-class IngredientViewSet(viewsets.ModelViewSet):
+
+class IngredientViewSet(ReferenceViewSet):
     """Ингредиенты."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    pagination_class = None
-    http_method_names = ['get']
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
-    filterset_fields = ['name']
+    reference_cache = ingredient_cache
+
+    def list_reference(self, request):
+        """Поиск по началу названия, затем по вхождению подстроки."""
+        name = request.query_params.get('name')
+        if not name:
+            return super().list_reference(request)
+        serializer = self.get_serializer(search_ingredients(name), many=True)
+        return Response(serializer.data)
 
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(ReferenceViewSet):
     """Теги."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
-    pagination_class = None
-    http_method_names = ['get']
+    reference_cache = tag_cache
 
 
 class UserViewSet(DjoserUserViewSet):
     permission_classes = [IsAuthenticatedOrReadOnly]
 
+    def get_queryset(self):
+        """Пользователи с признаком подписки одним запросом."""
+        user = self.request.user
+        if user.is_authenticated:
+            is_subscribed = Exists(Follow.objects.filter(
+                author=OuterRef('pk'), subscriber=user))
+        else:
+            is_subscribed = Value(False, output_field=BooleanField())
+        return super().get_queryset().annotate(is_subscribed=is_subscribed)
+
     @action(detail=False, methods=['get'], url_path='me',
             permission_classes=[IsAuthenticated])
     def get_me(self, request):
@@ -175,39 +311,71 @@ class UserViewSet(DjoserUserViewSet):
         )
         serializer.validate_subscription()
 
-        Follow.objects.create(
-            author=author,
-            subscriber=request.user
-        )
+        if not add_relation(Follow, author_id=author.id,
+                            subscriber_id=request.user.id):
+            return Response(
+                {'detail': 'Вы уже подписаны на этого пользователя'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
+        author.is_subscribed = True
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @subscribe.mapping.delete
     def delete_subscribe(self, request, id=None):
         """Удаление подписки."""
-        author = self.get_object()
-        current_user = request.user
-
-        SUBSCRIPTION = Follow.objects.filter(
-            author=author, subscriber=current_user)
-        if not SUBSCRIPTION.exists():
-            return Response(
-                {'detail': 'Вы не подписаны на этого пользователя'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        SUBSCRIPTION.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        if remove_relation(Follow, author_id=url_pk(User, id),
+                           subscriber_id=request.user.id):
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        self.get_object()
+        return Response(
+            {'detail': 'Вы не подписаны на этого пользователя'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
 
 class SubsList(generics.ListAPIView):
     """Список подписок текущего пользователя."""
 
     serializer_class = FollowSerializer
-    pagination_class = LimitOffsetPagination
+    pagination_class = SubscriptionPagination
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         """Текущие подписки пользователя."""
         return User.objects.filter(
-            idols__subscriber=self.request.user).prefetch_related('recipes')
+            subscribers__subscriber=self.request.user)
+
+    def paginate_queryset(self, queryset):
+        """Загрузка рецептов только для авторов текущей страницы."""
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            prefetch_related_objects(page, Prefetch(
+                'recipes',
+                queryset=top_recipes(
+                    [author.id for author in page],
+                    get_recipes_limit(self.request)),
+                to_attr='limited_recipes'
+            ))
+        return page
+
+
+TOP_RECIPES_SQL = (
+    'SELECT id FROM ('
+    'SELECT id, ROW_NUMBER() OVER ('
+    'PARTITION BY author_id ORDER BY name, id) AS position '
+    'FROM {table} WHERE author_id IN ({authors})'
+    ') ranked WHERE position <= %s'
+)
+
+
+def top_recipes(author_ids, limit):
+    """Первые limit рецептов каждого автора одним запросом."""
+    queryset = Recipe.objects.all()
+    if limit is None or not author_ids:
+        return queryset
+    sql = TOP_RECIPES_SQL.format(
+        table=Recipe._meta.db_table,
+        authors=', '.join(['%s'] * len(author_ids))
+    )
+    return queryset.filter(pk__in=RawSQL(sql, (*author_ids, limit)))
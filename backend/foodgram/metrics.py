@@ -0,0 +1,71 @@
+import os
+
+from django.http import HttpResponse
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+
+# Воркеры gunicorn пишут значения в файлы каталога
+# PROMETHEUS_MULTIPROC_DIR; /metrics собирает их вместе.
+MULTIPROCESS = 'PROMETHEUS_MULTIPROC_DIR' in os.environ
+
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+
+REQUEST_LATENCY = Histogram(
+    'foodgram_request_duration_seconds',
+    'Время обработки запроса.',
+    ['view', 'method'],
+)
+REQUEST_DB_TIME = Histogram(
+    'foodgram_request_db_seconds',
+    'Время SQL-запросов за один запрос.',
+    ['view', 'method'],
+)
+REQUEST_QUERIES = Histogram(
+    'foodgram_request_queries',
+    'Число SQL-запросов за один запрос.',
+    ['view', 'method'],
+    buckets=QUERY_BUCKETS,
+)
+RESPONSES = Counter(
+    'foodgram_responses',
+    'Ответы по коду статуса.',
+    ['view', 'method', 'status'],
+)
+IN_FLIGHT = Gauge(
+    'foodgram_requests_in_flight',
+    'Запросы в обработке.',
+    multiprocess_mode='livesum',
+)
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests',
+    'Обращения к кешам приложения.',
+    ['cache', 'result'],
+)
+
+
+def record_cache(name, hits=0, misses=0):
+    """Учёт попаданий и промахов кеша name."""
+
+    if hits:
+        CACHE_REQUESTS.labels(name, 'hit').inc(hits)
+    if misses:
+        CACHE_REQUESTS.labels(name, 'miss').inc(misses)
+
+
+def observe_request(view, method, status, duration, stats):
+    REQUEST_LATENCY.labels(view, method).observe(duration)
+    REQUEST_DB_TIME.labels(view, method).observe(stats.sql_time)
+    REQUEST_QUERIES.labels(view, method).observe(stats.queries)
+    RESPONSES.labels(view, method, status).inc()
+
+
+def metrics_view(request):
+    """Метрики в текстовом формате Prometheus."""
+
+    registry = REGISTRY
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return HttpResponse(generate_latest(registry),
+                        content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,202 @@
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import IN_FLIGHT, observe_request
+
+logger = logging.getLogger('foodgram.requests')
+
+# Запрос, повторившийся столько раз с разными параметрами, считается N+1.
+DUPLICATE_THRESHOLD = 3
+REPORTED_DUPLICATES = 5
+
+NUMBER = re.compile(r'\b\d+\b')
+STRING = re.compile(r"'(?:[^']|'')*'")
+PLACEHOLDERS = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+
+current_stats = ContextVar('request_stats', default=None)
+
+
+def normalize_sql(sql):
+    """SQL без значений: одинаковые по форме запросы дают одну строку."""
+
+    sql = STRING.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    return PLACEHOLDERS.sub('(...)', sql)
+
+
+class RequestStats:
+    """Запросы к базе и время этапов обработки одного запроса."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0
+        self.statements = Counter()
+        self.exact = Counter()
+        self.timings = Counter()
+        self.depth = Counter()
+        self.view_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+            self.statements[normalize_sql(sql)] += 1
+            self.exact[(sql, repr(params))] += 1
+
+    def duplicates(self):
+        """Повторяющиеся по форме запросы, самые частые первыми."""
+
+        return [
+            {'sql': sql, 'count': count}
+            for sql, count in self.statements.most_common(REPORTED_DUPLICATES)
+            if count >= DUPLICATE_THRESHOLD
+        ]
+
+    def exact_duplicates(self):
+        return sum(count - 1 for count in self.exact.values())
+
+
+@contextmanager
+def timed(name):
+    """Учёт времени этапа в статистике текущего запроса.
+
+    Вложенные замеры одного этапа не суммируются повторно.
+    """
+
+    stats = current_stats.get()
+    if stats is None or stats.depth[name]:
+        yield
+        return
+    stats.depth[name] += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.depth[name] -= 1
+        stats.timings[name] += time.perf_counter() - start
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    func = match.func
+    name = getattr(func, 'cls', func).__name__
+    actions = getattr(func, 'actions', None)
+    if actions:
+        name += '.' + actions.get(request.method.lower(), '')
+    return name
+
+
+class InstrumentationMiddleware:
+    """Число и время SQL-запросов, время view и сериализации.
+
+    Итог выдаётся заголовком Server-Timing и в метрики Prometheus;
+    медленные запросы с долей SLOW_REQUEST_SAMPLE_RATE пишутся в лог
+    foodgram.requests в JSON. Тело потокового ответа формируется после
+    отправки заголовков, поэтому Server-Timing для него учитывает только
+    view, а метрики и лог пишутся после выдачи всего тела.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            with IN_FLIGHT.track_inprogress(), self.count_queries(stats):
+                response = self.get_response(request)
+            self.finish_view(stats)
+        finally:
+            current_stats.reset(token)
+
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = self.server_timing(
+                stats, time.perf_counter() - start)
+        if response.streaming:
+            response.streaming_content = self.stream(
+                response.streaming_content, request, response, stats, start)
+        else:
+            self.finish(request, response, stats, start)
+        return response
+
+    @contextmanager
+    def count_queries(self, stats):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            yield
+
+    def stream(self, content, request, response, stats, start):
+        try:
+            with self.count_queries(stats):
+                yield from content
+        finally:
+            self.finish(request, response, stats, start)
+
+    def finish(self, request, response, stats, start):
+        total = time.perf_counter() - start
+        observe_request(view_name(request) or 'unmatched', request.method,
+                        response.status_code, total, stats)
+        if (total * 1000 >= settings.SLOW_REQUEST_MS
+                and random.random() < settings.SLOW_REQUEST_SAMPLE_RATE):
+            logger.warning(json.dumps(
+                self.report(request, response, stats, total),
+                ensure_ascii=False))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = current_stats.get()
+        if stats is not None:
+            stats.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Ответы DRF рендерятся после этого вызова: рендер не входит
+        # во время view.
+        stats = current_stats.get()
+        if stats is not None:
+            self.finish_view(stats)
+        return response
+
+    def finish_view(self, stats):
+        if stats.view_started is not None:
+            stats.timings['view'] += time.perf_counter() - stats.view_started
+            stats.view_started = None
+
+    def server_timing(self, stats, total):
+        metrics = [
+            f'db;dur={stats.sql_time * 1000:.1f};'
+            f'desc="{stats.queries} queries"',
+            *(f'{name};dur={duration * 1000:.1f}'
+              for name, duration in stats.timings.items()),
+            f'total;dur={total * 1000:.1f}',
+        ]
+        return ', '.join(metrics)
+
+    def report(self, request, response, stats, total):
+        return {
+            'method': request.method,
+            'path': request.path,
+            'view': view_name(request),
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'db_ms': round(stats.sql_time * 1000, 1),
+            'queries': stats.queries,
+            'exact_duplicates': stats.exact_duplicates(),
+            'duplicates': stats.duplicates(),
+            **{f'{name}_ms': round(duration * 1000, 1)
+               for name, duration in stats.timings.items()},
+        }
@@ -26,6 +26,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,10 +57,7 @@ TEMPLATES = [
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
-var = os.getenv('USE_POSTGRES')
-print('Перемення USE_POSTGRES', var)
 if os.getenv('USE_POSTGRES'):
-    print('Условие с пост грес')
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.postgresql',
@@ -71,7 +69,6 @@ if os.getenv('USE_POSTGRES'):
         }
     }
 else:
-    print('Условие с sqlite')
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
@@ -79,6 +76,18 @@ else:
         }
     }
 
+# Версии данных, токены и представления рецептов должны быть общими
+# для всех воркеров gunicorn: в docker-compose CACHE_BACKEND указывает
+# на memcached. LocMemCache по умолчанию — для разработки и тестов, он
+# допустим только с одним воркером (см. gunicorn.conf.py).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -110,13 +119,18 @@ USE_TZ = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 6,
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend']
 }
 
+# Время жизни закешированного COUNT(*) для постраничных списков, секунды.
+# 0 — считать точно на каждый запрос.
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', 0))
+
 DJOSER = {
     'PERMISSIONS': {
         'user_list': ['rest_framework.permissions.IsAuthenticatedOrReadOnly'],
@@ -136,4 +150,41 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / MEDIA_URL
 
+DEFAULT_FILE_STORAGE = 'foodgram.storage.ContentAddressedStorage'
+
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+# Заголовок Server-Timing с числом и временем SQL-запросов, временем view
+# и сериализации.
+# Server-Timing раскрывает внутреннее устройство: по умолчанию только
+# при DEBUG.
+SERVER_TIMING = os.getenv('SERVER_TIMING', str(DEBUG)).lower() == 'true'
+# Запросы дольше SLOW_REQUEST_MS миллисекунд пишутся в лог
+# foodgram.requests с вероятностью SLOW_REQUEST_SAMPLE_RATE.
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 500))
+SLOW_REQUEST_SAMPLE_RATE = float(os.getenv('SLOW_REQUEST_SAMPLE_RATE', 1))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {
+            'format': '%(asctime)s %(levelname)s %(name)s %(message)s',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'plain',
+        },
+    },
+    'root': {
+        'handlers': ['console'],
+        'level': os.getenv('LOG_LEVEL', 'INFO'),
+    },
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
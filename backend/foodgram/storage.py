@@ -0,0 +1,95 @@
+import hashlib
+import os
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+
+# Поля моделей, ссылающиеся на файлы в хранилище.
+MEDIA_REFERENCES = (
+    ('recipes.Recipe', 'image'),
+    ('users.User', 'avatar'),
+)
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, именующее файлы по SHA-256 содержимого.
+
+    Одинаковые файлы сохраняются один раз, а имена неизменяемы, поэтому
+    их можно отдавать с долгим сроком кеширования. Файл удаляется только
+    когда на него не ссылается ни одна запись; оставшиеся без ссылок
+    файлы удаляет команда collect_media.
+    """
+
+    def save(self, name, content, max_length=None):
+        directory, basename = os.path.split(name)
+        ext = os.path.splitext(basename)[1]
+        # Имя всегда считается заново: присланному имени доверять нельзя.
+        name = os.path.join(
+            directory, self.content_hash(content) + ext.lower())
+        return self._save_once(name, content, max_length)
+
+    def save_derivative(self, name, content, max_length=None):
+        """Сохранение производной копии под именем, выведенным из оригинала.
+
+        Только для внутреннего использования: имя не проверяется.
+        """
+        return self._save_once(name, content, max_length)
+
+    def _save_once(self, name, content, max_length):
+        if self.exists(name):
+            # Свежее mtime не даёт collect_media удалить файл, на который
+            # вот-вот сошлётся новая запись.
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
+
+    def content_hash(self, content):
+        sha256 = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks(HASH_CHUNK_SIZE):
+            sha256.update(chunk)
+        content.seek(0)
+        return sha256.hexdigest()
+
+    def references(self, name):
+        """Число записей, ссылающихся на файл."""
+        return sum(
+            apps.get_model(model).objects.filter(**{field: name}).count()
+            for model, field in MEDIA_REFERENCES
+        )
+
+    def delete(self, name):
+        if self.references(name):
+            return
+        super().delete(name)
+
+
+def referenced_names():
+    """Имена всех файлов, на которые ссылаются записи в базе."""
+    names = set()
+    for model, field in MEDIA_REFERENCES:
+        names.update(
+            apps.get_model(model).objects.exclude(**{field: ''})
+            .values_list(field, flat=True).iterator()
+        )
+    return names
+
+
+def is_referenced(stem):
+    """Ссылается ли какая-либо запись на файл с этим именем без расширения."""
+    return any(
+        apps.get_model(model).objects.filter(
+            **{f'{field}__startswith': stem + '.'}).exists()
+        for model, field in MEDIA_REFERENCES
+    )
+
+
+def media_directories():
+    """Каталоги хранилища, куда загружаются файлы моделей."""
+    return {
+        apps.get_model(model)._meta.get_field(field).upload_to
+        for model, field in MEDIA_REFERENCES
+    }
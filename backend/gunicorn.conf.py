@@ -0,0 +1,33 @@
+import os
+import shutil
+
+bind = '0.0.0.0:8000'
+
+
+LOCAL_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+def check_shared_cache(server):
+    """Кеш в памяти процесса не согласован между воркерами."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    from django.conf import settings
+    backend = settings.CACHES['default']['BACKEND']
+    if server.cfg.workers > 1 and backend == LOCAL_CACHE_BACKEND:
+        raise RuntimeError(
+            f'{backend} не подходит для {server.cfg.workers} воркеров: '
+            'задайте общий кеш через CACHE_BACKEND.')
+
+
+def on_starting(server):
+    """Проверка кеша и очистка метрик, оставшихся от прошлого запуска."""
+    check_shared_cache(server)
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,42 @@
+from django.core.checks import Tags, Warning, register
+from django.db import connections
+
+FTS_TABLE = 'recipes_recipe_fts'
+FTS_TRIGGERS = (
+    'recipes_recipe_fts_insert',
+    'recipes_recipe_fts_delete',
+    'recipes_recipe_fts_update',
+)
+
+
+@register(Tags.database)
+def check_fts_triggers(databases=None, **kwargs):
+    """Триггеры FTS5 на месте, если таблица поиска в SQLite создана.
+
+    Пересоздание таблицы recipes_recipe редактором схемы SQLite
+    удаляет её триггеры, и поиск перестаёт видеть новые рецепты.
+    """
+
+    errors = []
+    for alias in databases or ():
+        connection = connections[alias]
+        if connection.vendor != 'sqlite':
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT type, name FROM sqlite_master "
+                "WHERE name = %s OR type = 'trigger'", [FTS_TABLE])
+            found = {name for _, name in cursor.fetchall()}
+        if FTS_TABLE not in found:
+            continue
+        missing = [name for name in FTS_TRIGGERS if name not in found]
+        if missing:
+            errors.append(Warning(
+                f'В базе {alias} нет триггеров полнотекстового поиска: '
+                f'{", ".join(missing)}.',
+                hint='Выполните SQLITE_FORWARD из миграции '
+                     'recipes.0012_recipe_search: триггеры создаются '
+                     'повторно, индекс перестраивается.',
+                id='recipes.W001',
+            ))
+    return errors
@@ -0,0 +1,70 @@
+from django.apps import apps as global_apps
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+# (модель, поле счётчика, модель связи, поле связи)
+COUNTERS = (
+    ('recipes.Recipe', 'favorites_count', 'recipes.FavoriteRecipe', 'recipe'),
+    ('recipes.Recipe', 'in_carts_count', 'recipes.ShoppingCart', 'recipe'),
+    ('users.User', 'recipes_count', 'recipes.Recipe', 'author'),
+    ('users.User', 'subscribers_count', 'recipes.Follow', 'author'),
+)
+
+
+class CountersMixin:
+    """Сохранение модели без перезаписи её счётчиков.
+
+    Счётчики меняются только через UPDATE с F(), а полный save() старого
+    экземпляра затёр бы их устаревшими значениями.
+    """
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            counters = {field for label, field, *_ in COUNTERS
+                        if label == self._meta.label}
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in counters
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+
+def change_counters(related, instance, delta):
+    """Изменение счётчиков, зависящих от добавленной/удалённой связи.
+
+    Обновление идёт выражением F() в текущей транзакции.
+    """
+
+    for label, field, related_label, relation in COUNTERS:
+        if related._meta.label != related_label:
+            continue
+        pk = getattr(instance, related._meta.get_field(relation).attname)
+        global_apps.get_model(label).objects.filter(pk=pk).update(
+            **{field: Greatest(F(field) + delta, 0)})
+
+
+def actual_count(related, relation):
+    return Coalesce(Subquery(
+        related.objects.filter(**{relation: OuterRef('pk')})
+        .order_by().values(relation)
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def reconcile_counters(apps=global_apps):
+    """Пересчёт разошедшихся счётчиков по одному UPDATE на счётчик.
+
+    Возвращает число исправленных строк по каждому счётчику.
+    """
+
+    fixed = {}
+    for label, field, related_label, relation in COUNTERS:
+        actual = actual_count(apps.get_model(related_label), relation)
+        fixed[f'{label}.{field}'] = (
+            apps.get_model(label).objects
+            .exclude(**{field: actual})
+            .update(**{field: actual})
+        )
+    return fixed
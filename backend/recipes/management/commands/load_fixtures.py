@@ -0,0 +1,51 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.caches import ingredient_cache, tag_cache
+from recipes.management.loaders import batched, iter_json_array, upsert
+from recipes.models import Ingredient, Tag
+from .load_ingredients import report
+
+# Модель фикстуры: (модель, уникальное поле, обновляемые поля).
+MODELS = {
+    'recipes.tag': (Tag, 'slug', ('name',)),
+    'recipes.ingredient': (Ingredient, 'name', ('measurement_unit',)),
+}
+
+
+class Command(BaseCommand):
+    help = ('Загружает теги и ингредиенты из JSON-фикстуры формата '
+            'dumpdata с обновлением существующих записей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=settings.BASE_DIR.parent / 'data' / 'fixtures.json')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        rows = 0
+        with open(options['path'], encoding='utf-8') as file, \
+                transaction.atomic():
+            for batch in batched(iter_json_array(file),
+                                 options['batch_size']):
+                rows += self.load(batch)
+        tag_cache.invalidate()
+        ingredient_cache.invalidate()
+        report(self, rows, time.perf_counter() - start)
+
+    def load(self, batch):
+        by_model = {}
+        for item in batch:
+            label = item.get('model', '').lower()
+            if label not in MODELS:
+                raise CommandError(f'Неподдерживаемая модель: {label!r}.')
+            by_model.setdefault(label, []).append(item['fields'])
+        return sum(
+            upsert(MODELS[label][0], fields, *MODELS[label][1:])
+            for label, fields in by_model.items()
+        )
@@ -0,0 +1,63 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.caches import ingredient_cache
+from recipes.management.loaders import (batched, copy_upsert, iter_csv,
+                                        iter_json_array, upsert)
+from recipes.models import Ingredient
+
+FIELDS = ('name', 'measurement_unit')
+
+
+class Command(BaseCommand):
+    help = 'Загружает ингредиенты из CSV или JSON с обновлением существующих.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=settings.BASE_DIR.parent / 'data' / 'ingredients.csv')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--copy', action='store_true',
+            help='Загрузка через COPY во временную таблицу (PostgreSQL).')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy доступен только для PostgreSQL.')
+
+        start = time.perf_counter()
+        with open(path, encoding='utf-8') as file, transaction.atomic():
+            if options['copy']:
+                if path.suffix != '.csv':
+                    raise CommandError('--copy поддерживает только CSV.')
+                rows = copy_upsert(Ingredient, file, *self.fields())
+            else:
+                rows = self.load(file, path.suffix, options['batch_size'])
+        ingredient_cache.invalidate()
+        report(self, rows, time.perf_counter() - start)
+
+    def fields(self):
+        return FIELDS[0], FIELDS[1:]
+
+    def load(self, file, suffix, batch_size):
+        if suffix == '.json':
+            items = iter_json_array(file)
+        elif suffix == '.csv':
+            items = iter_csv(file, FIELDS)
+        else:
+            raise CommandError('Поддерживаются файлы .csv и .json.')
+        return sum(
+            upsert(Ingredient, batch, *self.fields())
+            for batch in batched(items, batch_size)
+        )
+
+
+def report(command, rows, elapsed):
+    command.stdout.write(command.style.SUCCESS(
+        f'Загружено строк: {rows} за {elapsed:.2f} с '
+        f'({rows / elapsed if elapsed else rows:.0f} строк/с)'))
@@ -0,0 +1,116 @@
+import csv
+import json
+from itertools import islice
+
+from django.db import connection
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def iter_csv(file, fields):
+    """Строки CSV без заголовка в виде словарей."""
+
+    for row in csv.reader(file):
+        if row:
+            yield dict(zip(fields, row))
+
+
+def iter_json_array(file):
+    """Элементы JSON-массива, читаемого из файла порциями."""
+
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    while True:
+        chunk = file.read(READ_CHUNK_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started and position < len(buffer):
+                if buffer[position] != '[':
+                    raise ValueError('Ожидался JSON-массив.')
+                started = True
+                position += 1
+                continue
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    if buffer[position:].strip():
+                        raise
+                    return
+                break
+            yield item
+            position = end
+
+
+def upsert(model, rows, unique_field, update_fields):
+    """INSERT ... ON CONFLICT DO UPDATE для PostgreSQL и SQLite.
+
+    Возвращает число вставленных или обновлённых строк.
+    """
+
+    # Повторы ключа в одной пачке запрещены в PostgreSQL.
+    rows = list({row[unique_field]: row for row in rows}.values())
+    if not rows:
+        return 0
+    quote = connection.ops.quote_name
+    fields = [unique_field, *update_fields]
+    placeholders = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    sql = (
+        f'INSERT INTO {quote(model._meta.db_table)} '
+        f'({", ".join(quote(field) for field in fields)}) '
+        'VALUES {values} '
+        f'ON CONFLICT ({quote(unique_field)}) DO UPDATE SET '
+        + ', '.join(f'{quote(field)} = excluded.{quote(field)}'
+                    for field in update_fields)
+    )
+    size = connection.ops.bulk_batch_size(fields, rows)
+    affected = 0
+    with connection.cursor() as cursor:
+        for batch in batched(rows, size):
+            cursor.execute(sql.format(values=', '.join(
+                [placeholders] * len(batch))),
+                [row[field] for row in batch for field in fields])
+            affected += cursor.rowcount
+    return affected
+
+
+def copy_upsert(model, file, unique_field, update_fields):
+    """Загрузка CSV через COPY во временную таблицу и upsert из неё.
+
+    Только для PostgreSQL; подходит для очень больших справочников.
+    """
+
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    staging = quote(f'{model._meta.db_table}_staging')
+    fields = [unique_field, *update_fields]
+    columns = ', '.join(quote(field) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMP TABLE {staging} ('
+            + ', '.join(f'{quote(field)} text' for field in fields)
+            + ') ON COMMIT DROP')
+        cursor.copy_expert(
+            f'COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)', file)
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}) '
+            f'SELECT DISTINCT ON ({quote(unique_field)}) {columns} '
+            f'FROM {staging} '
+            f'ON CONFLICT ({quote(unique_field)}) DO UPDATE SET '
+            + ', '.join(f'{quote(field)} = excluded.{quote(field)}'
+                        for field in update_fields)
+        )
+        return cursor.rowcount
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Индекс (tag, recipe) для фильтрации рецептов по тегам.
+
+    Промежуточная таблица создаётся Django автоматически, поэтому
+    индекс добавляется SQL-запросом.
+    """
+
+    dependencies = [
+        ('recipes', '0007_recipe_follow_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX recipe_tags_tag_recipe_idx '
+            'ON recipes_recipe_tags (tag_id, recipe_id)',
+            'DROP INDEX recipe_tags_tag_recipe_idx',
+        ),
+    ]
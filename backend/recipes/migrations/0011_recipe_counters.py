@@ -0,0 +1,46 @@
+# Generated by Django 3.2.16 on 2026-10-18 20:40
+
+from django.db import migrations, models
+
+# Заполнение счётчиков по состоянию на момент миграции; SQL записан
+# здесь, чтобы последующие изменения recipes.counters её не меняли.
+FILL_COUNTERS = [
+    'UPDATE recipes_recipe SET favorites_count = ('
+    'SELECT COUNT(*) FROM recipes_favoriterecipe '
+    'WHERE recipes_favoriterecipe.recipe_id = recipes_recipe.id)',
+    'UPDATE recipes_recipe SET in_carts_count = ('
+    'SELECT COUNT(*) FROM recipes_shoppingcart '
+    'WHERE recipes_shoppingcart.recipe_id = recipes_recipe.id)',
+    'UPDATE users_user SET recipes_count = ('
+    'SELECT COUNT(*) FROM recipes_recipe '
+    'WHERE recipes_recipe.author_id = users_user.id)',
+    'UPDATE users_user SET subscribers_count = ('
+    'SELECT COUNT(*) FROM recipes_follow '
+    'WHERE recipes_follow.author_id = users_user.id)',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_updated_at'),
+        ('users', '0005_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='В списках покупок'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-id'], name='recipe_popularity_idx'),
+        ),
+        migrations.RunSQL(FILL_COUNTERS, migrations.RunSQL.noop),
+    ]
@@ -2,6 +2,7 @@ from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
 
+from .counters import CountersMixin
 
 User = get_user_model()
 
@@ -50,7 +51,10 @@ class Ingredient(models.Model):
         return f'{self.name} ({self.measurement_unit})'
 
 
-class Recipe(models.Model):
+# На SQLite поиск держится на триггерах recipes_recipe_fts_* (миграция
+# 0012_recipe_search). Миграции, пересоздающие таблицу, их удаляют: после
+# такой миграции нужно создать триггеры заново, это проверяет recipes.W001.
+class Recipe(CountersMixin, models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -84,16 +88,60 @@ class Recipe(models.Model):
         validators=[MinValueValidator(1)],
         verbose_name='Время приготовления (мин)'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок'
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name', 'id'], name='recipe_name_id_idx'),
+            models.Index(fields=['-favorites_count', '-id'],
+                         name='recipe_popularity_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class ShortLink(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='short_link',
+        verbose_name='Рецепт'
+    )
+    code = models.CharField(
+        max_length=16,
+        unique=True,
+        verbose_name='Код'
+    )
+    hits = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Переходы'
+    )
+
+    class Meta:
+        verbose_name = 'Короткая ссылка'
+        verbose_name_plural = 'Короткие ссылки'
+
+    def __str__(self):
+        return self.code
+
+
 class RecipeIngredients(models.Model):
     recipe = models.ForeignKey(
         Recipe,
@@ -182,4 +230,8 @@ class Follow(models.Model):
                 name='unique_constraint'
             )
         ]
+        indexes = [
+            models.Index(fields=['subscriber', 'author'],
+                         name='follow_subscriber_author_idx'),
+        ]
         ordering = ['subscriber']
@@ -0,0 +1,49 @@
+import base64
+import io
+
+import pytest
+from django.core.cache import cache
+from PIL import Image
+
+from users.models import User
+
+
+@pytest.fixture(autouse=True)
+def local_cache(settings):
+    """Чистый кеш в памяти процесса для каждого теста."""
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    cache.clear()
+
+
+@pytest.fixture
+def media(settings, tmp_path):
+    """Загружаемые файлы пишутся во временный каталог теста."""
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+@pytest.fixture
+def make_user(db):
+    def make_user(username):
+        return User.objects.create_user(
+            username=username, email=f'{username}@example.com',
+            password='x', first_name='a', last_name='b')
+    return make_user
+
+
+@pytest.fixture
+def author(make_user):
+    return make_user('author')
+
+
+@pytest.fixture
+def image_data():
+    """Небольшое PNG-изображение в виде data URI."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), 'red').save(buffer, format='PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
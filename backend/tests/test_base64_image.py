@@ -0,0 +1,40 @@
+import base64
+import io
+
+import pytest
+from PIL import Image
+
+from api.serializers import BASE64_CHUNK_SIZE, Base64ImageField
+
+
+def png_bytes(size):
+    image = Image.effect_noise((size, size), 64).convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('encode', [base64.b64encode, base64.encodebytes])
+def test_decodes_plain_and_line_wrapped_base64(encode):
+    content = png_bytes(400)
+    encoded = encode(content).decode()
+    assert len(encoded) > 2 * BASE64_CHUNK_SIZE
+
+    file = Base64ImageField().decode_base64(
+        'data:image/png;base64,' + encoded)
+
+    assert file.read() == content
+
+
+def test_image_is_validated_from_disk(monkeypatch):
+    def no_copy(*args):
+        raise AssertionError('изображение скопировано в память')
+
+    monkeypatch.setattr('django.forms.fields.BytesIO', no_copy)
+    content = png_bytes(16)
+    data = 'data:image/png;base64,' + base64.b64encode(content).decode()
+
+    file = Base64ImageField().to_internal_value(data)
+
+    assert file.temporary_file_path()
+    assert file.size == len(content)
@@ -0,0 +1,50 @@
+"""Замеры эндпоинтов API через pytest-benchmark.
+
+Запуск: pytest tests/test_benchmark_api.py --benchmark-json=bench.json
+"""
+import pytest
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.management.commands.benchmark_api import (Command,
+                                                   authenticated_client,
+                                                   endpoint_urls)
+
+DATASET = {
+    'users': 10,
+    'recipes': 50,
+    'ingredients_per_recipe': 5,
+    'favorites': 5,
+    'carts': 5,
+    'follows': 5,
+    'ingredients_csv': settings.BASE_DIR.parent / 'data' / 'ingredients.csv',
+}
+ENDPOINTS = ('recipes-list', 'recipes-detail', 'subscriptions',
+             'ingredients-search', 'download-shopping-cart')
+
+
+@pytest.fixture
+def dataset(db):
+    return Command().seed(DATASET)
+
+
+def fetch(client, url):
+    response = client.get(url)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+@pytest.mark.parametrize('endpoint', ENDPOINTS)
+def test_endpoint(benchmark, dataset, endpoint):
+    client = authenticated_client(dataset['user'])
+    url = endpoint_urls(dataset)[endpoint]
+    fetch(client, url)
+    with CaptureQueriesContext(connection) as queries:
+        response = fetch(client, url)
+    benchmark.extra_info['queries'] = len(queries)
+
+    response = benchmark(fetch, client, url)
+
+    assert response.status_code == 200
@@ -0,0 +1,25 @@
+import importlib
+
+import pytest
+from django.db import connection
+
+from recipes.checks import check_fts_triggers
+
+search_migration = importlib.import_module(
+    'recipes.migrations.0012_recipe_search')
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(connection.vendor != 'sqlite', reason='только SQLite')
+def test_missing_fts_trigger_is_reported():
+    assert check_fts_triggers(databases=['default']) == []
+    with connection.cursor() as cursor:
+        cursor.execute('DROP TRIGGER recipes_recipe_fts_update')
+    [warning] = check_fts_triggers(databases=['default'])
+    assert warning.id == 'recipes.W001'
+    assert 'recipes_recipe_fts_update' in warning.msg
+
+    with connection.cursor() as cursor:
+        for sql in search_migration.SQLITE_FORWARD:
+            cursor.execute(sql)
+    assert check_fts_triggers(databases=['default']) == []
@@ -0,0 +1,34 @@
+import pytest
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Tag
+
+
+@pytest.mark.django_db
+def test_full_saves_keep_counters(media, author, image_data):
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=author).key}')
+    # Пользователь попадает в кеш токенов до появления рецепта.
+    assert client.get('/api/users/me/').status_code == 200
+    tag = Tag.objects.create(name='t', slug='t')
+    ingredient = Ingredient.objects.create(name='i', measurement_unit='г')
+    payload = {
+        'name': 'r', 'text': 't', 'cooking_time': 5, 'image': image_data,
+        'tags': [tag.id], 'ingredients': [{'id': ingredient.id, 'amount': 1}],
+    }
+    recipe_id = client.post('/api/recipes/', payload, format='json').data['id']
+    response = client.post(f'/api/recipes/{recipe_id}/favorite/')
+    assert response.status_code == 201
+
+    response = client.put('/api/users/me/avatar/', {'avatar': image_data},
+                          format='json')
+    assert response.status_code == 200
+    response = client.patch(f'/api/recipes/{recipe_id}/',
+                            dict(payload, text='new'), format='json')
+    assert response.status_code == 200
+
+    author.refresh_from_db()
+    assert author.recipes_count == 1
+    assert Recipe.objects.get(id=recipe_id).favorites_count == 1
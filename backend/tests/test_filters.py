@@ -0,0 +1,48 @@
+import pytest
+from rest_framework.test import APIClient
+
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart, Tag
+
+
+@pytest.fixture
+def client(author):
+    client = APIClient()
+    client.force_authenticate(author)
+    return client
+
+
+@pytest.fixture
+def recipes(author):
+    tags = [Tag.objects.create(name=slug, slug=slug)
+            for slug in ('breakfast', 'dinner')]
+    favorite, in_cart = (
+        Recipe.objects.create(author=author, name=name, text='t',
+                              cooking_time=5)
+        for name in ('favorite', 'in_cart'))
+    for recipe in favorite, in_cart:
+        recipe.tags.set(tags)
+    FavoriteRecipe.objects.create(user=author, recipe=favorite)
+    ShoppingCart.objects.create(user=author, recipe=in_cart)
+    return favorite, in_cart
+
+
+def names(response):
+    assert response.status_code == 200
+    return [recipe['name'] for recipe in response.data['results']]
+
+
+@pytest.mark.django_db
+def test_is_in_shopping_cart_uses_the_cart(client, recipes):
+    assert names(client.get('/api/recipes/?is_in_shopping_cart=1')) == [
+        'in_cart']
+    assert names(client.get('/api/recipes/?is_favorited=1')) == [
+        'favorite']
+
+
+@pytest.mark.django_db
+def test_combined_filters_do_not_duplicate_rows(client, author, recipes):
+    response = client.get(
+        '/api/recipes/?is_in_shopping_cart=1&tags=breakfast&tags=dinner'
+        f'&author={author.id}')
+    assert names(response) == ['in_cart']
+    assert response.data['count'] == 1
@@ -0,0 +1,35 @@
+import io
+import os
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.images import RECIPE_IMAGE_VARIANTS, derivative_name
+from recipes.models import Recipe
+
+
+def image_file():
+    buffer = io.BytesIO()
+    Image.new('RGB', (600, 400), 'red').save(buffer, format='PNG')
+    return ContentFile(buffer.getvalue(), name='image.png')
+
+
+@pytest.mark.django_db
+def test_missing_derivative_falls_back_until_backfilled(media, author):
+    recipe = Recipe(author=author, name='r', text='t', cooking_time=5)
+    recipe.image.save('image.png', image_file())
+    for variant in RECIPE_IMAGE_VARIANTS:
+        os.remove(media / derivative_name(recipe.image.name, variant))
+    client = APIClient()
+
+    data = client.get(f'/api/recipes/{recipe.id}/').data
+    assert data['image_thumbnail'] == data['image']
+
+    call_command('generate_derivatives', stdout=io.StringIO())
+
+    data = client.get(f'/api/recipes/{recipe.id}/').data
+    assert data['image_thumbnail'].endswith(
+        derivative_name(recipe.image.name, 'thumbnail'))
@@ -0,0 +1,34 @@
+import json
+import re
+
+import pytest
+from rest_framework.test import APIClient
+
+from recipes.models import (Ingredient, Recipe, RecipeIngredients,
+                            ShoppingCart)
+
+
+@pytest.mark.django_db
+def test_streamed_body_queries_are_counted(settings, caplog, author):
+    settings.SERVER_TIMING = True
+    settings.SLOW_REQUEST_MS = 0
+    settings.SLOW_REQUEST_SAMPLE_RATE = 1
+    recipe = Recipe.objects.create(
+        author=author, name='r', text='t', cooking_time=5)
+    RecipeIngredients.objects.create(
+        recipe=recipe, amount=2,
+        ingredient=Ingredient.objects.create(name='i', measurement_unit='г'))
+    ShoppingCart.objects.create(user=author, recipe=recipe)
+    client = APIClient()
+    client.force_authenticate(author)
+
+    with caplog.at_level('WARNING', logger='foodgram.requests'):
+        response = client.get('/api/recipes/download_shopping_cart/')
+        assert not caplog.records
+        body = b''.join(response.streaming_content)
+
+    assert 'i' in body.decode()
+    header_queries = int(
+        re.search(r'"(\d+) queries"', response['Server-Timing']).group(1))
+    [record] = caplog.records
+    assert json.loads(record.getMessage())['queries'] > header_queries
@@ -0,0 +1,52 @@
+import base64
+import json
+
+import pytest
+from rest_framework.test import APIClient
+
+from recipes.models import Follow, Recipe
+
+
+def cursor(position):
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+@pytest.fixture
+def client(author):
+    client = APIClient()
+    client.force_authenticate(author)
+    return client
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url, position', [
+    ('/api/users/subscriptions/', ['zz']),
+    ('/api/users/subscriptions/', [None]),
+    ('/api/users/subscriptions/', [[1]]),
+    ('/api/recipes/', ['name', 'zz']),
+    ('/api/recipes/?ordering=popular', ['zz', 1]),
+])
+def test_malformed_cursor_values_are_not_found(client, url, position):
+    separator = '&' if '?' in url else '?'
+    response = client.get(f'{url}{separator}cursor={cursor(position)}')
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_next_cursor_continues_the_feed(client, author, make_user):
+    for number in range(3):
+        Follow.objects.create(subscriber=author,
+                              author=make_user(f'user{number}'))
+        Recipe.objects.create(author=author, name=f'r{number}', text='t',
+                              cooking_time=5)
+    for url in '/api/users/subscriptions/', '/api/recipes/?search=r':
+        seen = []
+        separator = '&' if '?' in url else '?'
+        response = client.get(f'{url}{separator}cursor=&limit=2')
+        while True:
+            assert response.status_code == 200
+            seen += [item['id'] for item in response.data['results']]
+            if not response.data['next']:
+                break
+            response = client.get(response.data['next'])
+        assert len(seen) == len(set(seen)) == 3
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from api.pantry import PantryIndex
+from recipes.models import Ingredient, Recipe, RecipeIngredients
+
+
+def make_recipe(author, name, ingredients):
+    recipe = Recipe.objects.create(
+        author=author, name=name, text='t', cooking_time=5)
+    RecipeIngredients.objects.bulk_create(
+        RecipeIngredients(recipe=recipe, ingredient=ingredient, amount=1)
+        for ingredient in ingredients)
+    return recipe
+
+
+def search(index, ingredients):
+    index._checked_at = 0
+    recipe_ids, coverage, missing = index.search(
+        [ingredient.id for ingredient in ingredients])
+    return dict(zip(recipe_ids.tolist(), missing.tolist()))
+
+
+def state(index):
+    return (index._recipe_ids.tolist(), index._indptr.tolist(),
+            index._indices.tolist(),
+            {pk: posting.tolist() for pk, posting in index._postings.items()
+             if len(posting)})
+
+
+@pytest.mark.django_db(transaction=True)
+def test_incremental_update_matches_full_build(author):
+    salt, egg, milk = (Ingredient.objects.create(name=name,
+                                                 measurement_unit='г')
+                       for name in ('salt', 'egg', 'milk'))
+    first = make_recipe(author, 'first', [salt, egg])
+    index = PantryIndex()
+    assert search(index, [salt]) == {first.id: 1}
+
+    second = make_recipe(author, 'second', [milk, salt])
+    RecipeIngredients.objects.filter(recipe=first, ingredient=egg).delete()
+    first.save()
+    assert search(index, [salt]) == {first.id: 0, second.id: 1}
+
+    rebuilt = PantryIndex()
+    rebuilt.refresh()
+    assert state(index) == state(rebuilt)
+    assert np.array_equal(index._indptr, [0, 1, 3])
+
+
+@pytest.mark.django_db(transaction=True)
+def test_ingredient_delete_rebuilds_index(author):
+    salt, egg = (Ingredient.objects.create(name=name, measurement_unit='г')
+                 for name in ('salt', 'egg'))
+    recipe = make_recipe(author, 'omelette', [salt, egg])
+    index = PantryIndex()
+    assert search(index, [salt]) == {recipe.id: 1}
+
+    egg.delete()
+    assert search(index, [salt]) == {recipe.id: 0}
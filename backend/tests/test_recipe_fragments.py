@@ -0,0 +1,37 @@
+import pytest
+from rest_framework.test import APIClient
+
+from api.caches import bump_version, ingredient_cache, tag_cache
+from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag
+
+
+@pytest.fixture
+def recipe(author):
+    recipe = Recipe.objects.create(
+        author=author, name='r', text='t', cooking_time=5)
+    recipe.tags.add(Tag.objects.create(name='old', slug='old'))
+    RecipeIngredients.objects.create(
+        recipe=recipe, amount=2,
+        ingredient=Ingredient.objects.create(name='salt',
+                                             measurement_unit='г'))
+    return recipe
+
+
+@pytest.mark.django_db
+def test_fragment_uses_current_rows_not_lagging_process_cache(recipe):
+    tag_cache.invalidate()
+    ingredient_cache.invalidate()
+    tag_cache.list()
+    ingredient_cache.list()
+    # Другой процесс переименовал тег и ингредиент и сменил версии;
+    # справочники этого процесса ещё не перечитаны.
+    Tag.objects.update(name='new')
+    Ingredient.objects.update(name='pepper')
+    bump_version('tags')
+    bump_version('ingredients')
+
+    data = APIClient().get(f'/api/recipes/{recipe.id}/').data
+
+    assert [tag['name'] for tag in data['tags']] == ['new']
+    assert [item['name'] for item in data['ingredients']] == ['pepper']
+    assert data['ingredients'][0]['amount'] == 2
@@ -0,0 +1,40 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.caches import ingredient_cache, tag_cache
+from recipes.models import Ingredient, Tag
+
+
+@pytest.fixture
+def warm_caches():
+    for reference_cache in tag_cache, ingredient_cache:
+        reference_cache.invalidate()
+        reference_cache.list()
+
+
+@pytest.mark.django_db
+def test_rows_created_by_another_process_are_found(
+        warm_caches, media, author, image_data):
+    # bulk_create не шлёт сигналов: так выглядит запись другого процесса
+    # до того, как этот заметит смену версии.
+    Tag.objects.bulk_create([Tag(name='t', slug='t')])
+    Ingredient.objects.bulk_create(
+        [Ingredient(name='salt', measurement_unit='г')])
+    tag, ingredient = Tag.objects.get(), Ingredient.objects.get()
+
+    with CaptureQueriesContext(connection) as queries:
+        assert ingredient_cache.get(ingredient.id)['name'] == 'salt'
+    assert len(queries) == 1
+    assert ingredient_cache.get(0) is None
+
+    client = APIClient()
+    assert client.get(f'/api/tags/{tag.id}/').data['slug'] == 't'
+    client.force_authenticate(author)
+    response = client.post('/api/recipes/', {
+        'name': 'r', 'text': 't', 'cooking_time': 5, 'image': image_data,
+        'tags': [tag.id], 'ingredients': [{'id': ingredient.id, 'amount': 1}],
+    }, format='json')
+    assert response.status_code == 201
+    assert response.data['ingredients'][0]['name'] == 'salt'
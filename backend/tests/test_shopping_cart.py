@@ -0,0 +1,74 @@
+import csv
+import io
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, RecipeIngredients, ShoppingCart
+
+
+@pytest.fixture
+def client(author):
+    client = APIClient()
+    client.force_authenticate(author)
+    return client
+
+
+@pytest.fixture
+def ingredients():
+    return {name: Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('pepper', 'salt', 'sugar')}
+
+
+def add_recipe(author, name, amounts, ingredients):
+    recipe = Recipe.objects.create(author=author, name=name, text='t',
+                                   cooking_time=5)
+    RecipeIngredients.objects.bulk_create(
+        RecipeIngredients(recipe=recipe, ingredient=ingredients[ingredient],
+                          amount=amount)
+        for ingredient, amount in amounts.items())
+    return recipe
+
+
+def download(client, file_format):
+    response = client.get('/api/recipes/download_shopping_cart/',
+                          {'file_format': file_format})
+    assert response.status_code == 200
+    return response.getvalue().decode()
+
+
+@pytest.mark.django_db
+def test_totals_cover_only_own_cart(client, author, make_user, ingredients):
+    for name, amounts in (('soup', {'salt': 2, 'pepper': 1}),
+                          ('stew', {'salt': 3})):
+        ShoppingCart.objects.create(
+            user=author,
+            recipe=add_recipe(author, name, amounts, ingredients))
+    ShoppingCart.objects.create(
+        user=make_user('other'),
+        recipe=add_recipe(author, 'cake', {'sugar': 7}, ingredients))
+
+    assert download(client, 'txt').splitlines()[1:] == [
+        '• pepper: 1г', '• salt: 5г']
+    rows = list(csv.reader(io.StringIO(download(client, 'csv'))))
+    assert rows[1:] == [['pepper', '1', 'г'], ['salt', '5', 'г']]
+
+
+@pytest.mark.django_db
+def test_query_count_does_not_grow_with_cart(client, author, ingredients):
+    def queries():
+        with CaptureQueriesContext(connection) as captured:
+            download(client, 'txt')
+        return len(captured)
+
+    ShoppingCart.objects.create(
+        user=author,
+        recipe=add_recipe(author, 'r0', {'salt': 1}, ingredients))
+    single = queries()
+    for number in range(1, 6):
+        ShoppingCart.objects.create(
+            user=author, recipe=add_recipe(
+                author, f'r{number}', {'salt': 1, 'sugar': 1}, ingredients))
+    assert queries() == single
@@ -0,0 +1,38 @@
+import time
+
+import pytest
+
+from api.short_links import HitCounter
+from recipes.models import Recipe, ShortLink
+
+
+@pytest.fixture
+def link(author):
+    recipe = Recipe.objects.create(
+        author=author, name='r', text='t', cooking_time=5)
+    return ShortLink.objects.create(recipe=recipe, code='abc123')
+
+
+def hits(link):
+    link.refresh_from_db()
+    return link.hits
+
+
+@pytest.mark.django_db(transaction=True)
+def test_hits_are_flushed_without_new_requests(link):
+    counter = HitCounter(0.05)
+    counter.add(link.code)
+    counter.add(link.code)
+    deadline = time.monotonic() + 2
+    while hits(link) < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    counter.stop()
+    assert hits(link) == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stop_flushes_pending_hits(link):
+    counter = HitCounter(60)
+    counter.add(link.code)
+    counter.stop()
+    assert hits(link) == 1
@@ -0,0 +1,46 @@
+import hashlib
+import io
+import os
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+
+from recipes.models import Recipe
+
+
+def test_hashed_looking_name_is_rehashed(media):
+    victim = 'a' * 64 + '.png'
+    name = default_storage.save(f'recipes/images/{victim}',
+                                ContentFile(b'payload'))
+    expected = hashlib.sha256(b'payload').hexdigest() + '.png'
+    assert name == f'recipes/images/{expected}'
+    assert not default_storage.exists(f'recipes/images/{victim}')
+
+
+def test_dedup_hit_refreshes_mtime(media):
+    name = default_storage.save('recipes/images/x.png', ContentFile(b'1'))
+    path = default_storage.path(name)
+    os.utime(path, (0, 0))
+    default_storage.save('recipes/images/y.png', ContentFile(b'1'))
+    assert os.stat(path).st_mtime > 0
+
+
+@pytest.mark.django_db
+def test_collect_media_rechecks_references(media, author, monkeypatch):
+    # Запись появилась уже после того, как команда собрала ссылки.
+    monkeypatch.setattr(
+        'api.management.commands.collect_media.referenced_names', set)
+    orphan = default_storage.save('recipes/images/o.png', ContentFile(b'o'))
+    recipe = Recipe.objects.create(
+        author=author, name='r', text='t', cooking_time=5,
+        image=default_storage.save('recipes/images/r.png',
+                                   ContentFile(b'r')))
+    for name in orphan, recipe.image.name:
+        os.utime(default_storage.path(name), (0, 0))
+
+    call_command('collect_media', stdout=io.StringIO())
+
+    assert not default_storage.exists(orphan)
+    assert default_storage.exists(recipe.image.name)
@@ -0,0 +1,83 @@
+import pytest
+from django.db.models import QuerySet
+from rest_framework.test import APIClient
+
+from recipes.models import Follow, Recipe
+
+
+@pytest.fixture
+def client(author):
+    client = APIClient()
+    client.force_authenticate(author)
+    return client
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', [
+    '/api/users/abc/subscribe/',
+    '/api/recipes/abc/favorite/',
+    '/api/recipes/abc/shopping_cart/',
+])
+def test_delete_with_non_numeric_id_is_not_found(client, url, monkeypatch):
+    # На Postgres нечисловой id в DELETE давал DataError: связь не
+    # должна удаляться до проверки id.
+    monkeypatch.setattr('api.views.remove_relation', None)
+    assert client.delete(url).status_code == 404
+
+
+@pytest.fixture
+def recipe(author):
+    return Recipe.objects.create(author=author, name='r', text='t',
+                                 cooking_time=5)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('action', ['favorite', 'shopping_cart'])
+def test_recipe_toggle_status_codes(client, recipe, action):
+    url = f'/api/recipes/{recipe.id}/{action}/'
+    response = client.post(url)
+    assert response.status_code == 201
+    assert response.data['id'] == recipe.id
+    assert client.post(url).status_code == 400
+    assert client.delete(url).status_code == 204
+    assert client.delete(url).status_code == 400
+    assert client.post(f'/api/recipes/{recipe.id + 1}/{action}/'
+                       ).status_code == 404
+    assert client.delete(f'/api/recipes/{recipe.id + 1}/{action}/'
+                         ).status_code == 404
+
+
+@pytest.mark.django_db
+def test_subscribe_status_codes(client, author, make_user):
+    other = make_user('other')
+    url = f'/api/users/{other.id}/subscribe/'
+    response = client.post(url)
+    assert response.status_code == 201
+    assert response.data['is_subscribed'] is True
+    assert client.post(url).status_code == 400
+    assert client.post(f'/api/users/{author.id}/subscribe/'
+                       ).status_code == 400
+    assert client.delete(url).status_code == 204
+    assert client.delete(url).status_code == 400
+    assert client.post(f'/api/users/{other.id + 1}/subscribe/'
+                       ).status_code == 404
+    assert Follow.objects.count() == 0
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', [
+    '/api/recipes/{recipe}/favorite/',
+    '/api/recipes/{recipe}/shopping_cart/',
+    '/api/users/{other}/subscribe/',
+])
+def test_toggles_do_not_trust_a_prior_existence_check(
+        client, recipe, make_user, monkeypatch, url):
+    url = url.format(recipe=recipe.id, other=make_user('other').id)
+    assert client.post(url).status_code == 201
+    # Проверка существования устарела: параллельный запрос успел
+    # добавить или удалить связь.
+    monkeypatch.setattr(QuerySet, 'exists', lambda self: False)
+    assert client.post(url).status_code == 400
+    assert client.delete(url).status_code == 204
+    monkeypatch.setattr(QuerySet, 'exists', lambda self: True)
+    assert client.delete(url).status_code == 400
@@ -0,0 +1,21 @@
+import pytest
+from django.db import transaction
+from rest_framework.test import APIClient
+
+from api.caches import get_version
+from recipes.models import Recipe
+
+
+@pytest.mark.django_db(transaction=True)
+def test_version_is_bumped_after_commit(author):
+    before = get_version('recipes')
+    with transaction.atomic():
+        Recipe.objects.create(
+            author=author, name='r', text='t', cooking_time=5)
+        assert get_version('recipes') == before
+    assert get_version('recipes') != before
+
+
+@pytest.mark.django_db
+def test_non_numeric_recipe_id_is_not_found():
+    assert APIClient().get('/api/recipes/abc/').status_code == 404
@@ -1,14 +1,19 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from recipes.counters import CountersMixin
 
-class User(AbstractUser):
+
+class User(CountersMixin, AbstractUser):
     email = models.EmailField(unique=True)
     avatar = models.ImageField(
         upload_to='users/',
     )
     first_name = models.CharField(max_length=150)
     last_name = models.CharField(max_length=150)
+    recipes_count = models.PositiveIntegerField(default=0, editable=False)
+    subscribers_count = models.PositiveIntegerField(default=0,
+                                                    editable=False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']